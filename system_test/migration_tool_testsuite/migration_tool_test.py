@@ -20,8 +20,10 @@
 # migration_tool_test.py
 # ===================================
 
+import copy
 import inspect
 import logging
+import multiprocessing
 import os
 import signal
 import subprocess
@@ -41,6 +43,35 @@ from   testcase_env       import TestcaseEnv
 import kafka_system_test_utils
 import metrics
 
+# max. no. of seconds a single testcase attempt is expected to take. The
+# shards are waited for at most this long per attempt of each of their testcases
+MAX_TESTCASE_DURATION_SEC = 1800
+
+# max. no. of times to run a testcase failing with a retryable error
+# (see kafka_system_test_utils.RETRYABLE)
+MAX_TESTCASE_ATTEMPTS = 3
+
+# cache of (suite dir, prefix) => sorted tuple of testcase dir pathnames
+_sortedDirPathsCache = {}
+
+def _listdir_sorted(suiteDir, prefix):
+    # scan the suite dir once per process. The tuple is passed on to the
+    # shards such that the workers don't re-scan the suite dir
+    key = (suiteDir, prefix)
+    if key not in _sortedDirPathsCache:
+        _sortedDirPathsCache[key] = tuple(system_test_utils.get_dir_paths_with_prefix(suiteDir, prefix))
+    return _sortedDirPathsCache[key]
+
+def _run_testcase_shard(systemTestEnv, shardId, numShards, testCasePathNameList):
+    # module level function such that it can be pickled into the worker process.
+    # The pool only forwards Exception to the parent : anything else (e.g.
+    # SystemExit) would kill the worker and leave the parent waiting forever
+    try:
+        testInstance = MigrationToolTest(systemTestEnv)
+        return testInstance.runTestcaseShard(shardId, numShards, testCasePathNameList)
+    except BaseException:
+        raise Exception("shard [" + str(shardId) + "] aborted : " + traceback.format_exc())
+
 class MigrationToolTest(ReplicationUtils, SetupUtils):
 
     testModuleAbsPathName = os.path.realpath(__file__)
@@ -56,6 +87,22 @@ class MigrationToolTest(ReplicationUtils, SetupUtils):
 
         super(MigrationToolTest, self).__init__(self)
 
+        # the shard running the testcases of this instance (see runTest)
+        self.shardId   = 0
+        self.numShards = 1
+
+        # signature of the zookeeper / broker cluster left running by the previous
+        # testcase in this shard (None if no cluster is running) and the
+        # cluster config it was started with
+        self.sharedClusterSignature = None
+        self.sharedClusterConfigDictList = None
+
+        # results of the last run of this testsuite (see --resume). A testcase
+        # is only skipped if it passed with the same commit and config
+        self.resultsManifestPathName = self.testSuiteAbsPathName + "/" + \
+            SystemTestEnv.RESULTS_MANIFEST_DIRNAME + "/" + SystemTestEnv.RESULTS_MANIFEST_FILENAME
+        self.gitSha = system_test_utils.get_git_sha(self.testSuiteAbsPathName)
+
         # dict to pass user-defined attributes to logger argument: "extra"
         d = {'name_of_class': self.__class__.__name__}
 
@@ -72,239 +119,450 @@ class MigrationToolTest(ReplicationUtils, SetupUtils):
         # ======================================================================
         # get all testcase directories under this testsuite
         # ======================================================================
-        testCasePathNameList = system_test_utils.get_dir_paths_with_prefix(
-            self.testSuiteAbsPathName, SystemTestEnv.SYSTEM_TEST_CASE_PREFIX)
-        testCasePathNameList.sort()
-
-        # =============================================================
-        # launch each testcase one by one: testcase_1, testcase_2, ...
-        # =============================================================
-        for testCasePathName in testCasePathNameList:
-   
-            skipThisTestCase = False
-
-            try: 
-                # ======================================================================
-                # A new instance of TestcaseEnv to keep track of this testcase's env vars
-                # and initialize some env vars as testCasePathName is available now
-                # ======================================================================
-                self.testcaseEnv = TestcaseEnv(self.systemTestEnv, self)
-                self.testcaseEnv.testSuiteBaseDir = self.testSuiteAbsPathName
-                self.testcaseEnv.initWithKnownTestCasePathName(testCasePathName)
-                self.testcaseEnv.testcaseArgumentsDict = self.testcaseEnv.testcaseNonEntityDataDict["testcase_args"]
-
-                # ======================================================================
-                # SKIP if this case is IN testcase_to_skip.json or NOT IN testcase_to_run.json
-                # ======================================================================
-                testcaseDirName = self.testcaseEnv.testcaseResultsDict["_test_case_name"]
-
-                if self.systemTestEnv.printTestDescriptionsOnly:
-                    self.testcaseEnv.printTestCaseDescription(testcaseDirName)
-                    continue
-                elif self.systemTestEnv.isTestCaseToSkip(self.__class__.__name__, testcaseDirName):
-                    self.log_message("Skipping : " + testcaseDirName)
-                    skipThisTestCase = True
-                    continue
+        testCasePathNameList = _listdir_sorted(self.testSuiteAbsPathName, SystemTestEnv.SYSTEM_TEST_CASE_PREFIX)
+
+        # ======================================================================
+        # SKIP the cases IN testcase_to_skip.json or NOT IN testcase_to_run.json
+        # before sharding such that the shards only get the cases to run
+        # ======================================================================
+        if not self.systemTestEnv.printTestDescriptionsOnly:
+            resultsManifestDict = {}
+            if self.systemTestEnv.resume:
+                resultsManifestDict = system_test_utils.load_results_manifest(self.resultsManifestPathName)
+
+            testCaseToRunPathNameList = []
+            for testCasePathName in testCasePathNameList:
+                testcaseDirName = os.path.basename(testCasePathName)
+                if self.systemTestEnv.isTestCaseToSkip(self.__class__.__name__, testcaseDirName):
+                    self.log_message("Skipping : %s", testcaseDirName)
+                elif self.isTestCasePassedInLastRun(testCasePathName, resultsManifestDict):
+                    self.log_message("resume: skipping %s passed in the last run", testcaseDirName)
                 else:
-                    self.testcaseEnv.printTestCaseDescription(testcaseDirName)
-                    system_test_utils.setup_remote_hosts_with_testcase_level_cluster_config(self.systemTestEnv, testCasePathName)
-
-                # ============================================================================== #
-                # ============================================================================== #
-                #                   Product Specific Testing Code Starts Here:                   #
-                # ============================================================================== #
-                # ============================================================================== #
-    
-                # initialize self.testcaseEnv with user-defined environment variables (product specific)
-                self.testcaseEnv.userDefinedEnvVarDict["zkConnectStr"] = ""
-                self.testcaseEnv.userDefinedEnvVarDict["stopBackgroundProducer"]    = False
-                self.testcaseEnv.userDefinedEnvVarDict["backgroundProducerStopped"] = False
-
-                # initialize signal handler
-                signal.signal(signal.SIGINT, self.signal_handler)
-    
-                # create "LOCAL" log directories for metrics, dashboards for each entity under this testcase
-                # for collecting logs from remote machines
-                kafka_system_test_utils.generate_testcase_log_dirs(self.systemTestEnv, self.testcaseEnv)
-    
-                # TestcaseEnv.testcaseConfigsList initialized by reading testcase properties file:
-                #   system_test/<suite_name>_testsuite/testcase_<n>/testcase_<n>_properties.json
-                self.testcaseEnv.testcaseConfigsList = system_test_utils.get_json_list_data(
-                    self.testcaseEnv.testcasePropJsonPathName)
-    
-                # TestcaseEnv - initialize producer & consumer config / log file pathnames
-                kafka_system_test_utils.init_entity_props(self.systemTestEnv, self.testcaseEnv)
+                    testCaseToRunPathNameList.append(testCasePathName)
+            testCasePathNameList = tuple(testCaseToRunPathNameList)
 
+        if self.systemTestEnv.printTestDescriptionsOnly:
+            self.runTestcaseShard(0, 1, testCasePathNameList)
+            return
+
+        # open the ssh connections to the remote hosts once for all testcases
+        system_test_utils.open_ssh_control_masters(self.systemTestEnv.clusterEntityConfigDictList)
+        try:
+            self.runTestcaseShards(testCasePathNameList)
+        finally:
+            system_test_utils.close_ssh_control_masters(self.systemTestEnv.clusterEntityConfigDictList)
+
+    def runTestcaseShards(self, testCasePathNameList):
+
+        # ======================================================================
+        # partition the testcases evenly into (no. of cores - 2) shards and
+        # launch the shards concurrently. The testcases in each shard are run
+        # one by one: testcase_1, testcase_2, ...
+        # ======================================================================
+        numShards = min(max(1, multiprocessing.cpu_count() - 2),
+                        kafka_system_test_utils.MAX_NUM_SHARDS,
+                        max(1, len(testCasePathNameList)))
+
+        if numShards == 1:
+            self.runTestcaseShard(0, 1, testCasePathNameList)
+            return
+
+        self.log_message("running %s testcases in %s shards", len(testCasePathNameList), numShards)
+        pool = multiprocessing.Pool(processes=numShards)
+        try:
+            asyncResultList = []
+            for shardId in range(numShards):
+                asyncResultList.append(pool.apply_async(_run_testcase_shard,
+                    (self.systemTestEnv, shardId, numShards, testCasePathNameList[shardId::numShards])))
+            pool.close()
+
+            # get() re-raises any exception thrown in the shard. The timeout
+            # keeps the wait interruptible by Ctrl+c
+            maxTestcasesPerShard = (len(testCasePathNameList) + numShards - 1) // numShards
+            deadline = time.time() + maxTestcasesPerShard * MAX_TESTCASE_ATTEMPTS * MAX_TESTCASE_DURATION_SEC
+            for asyncResult in asyncResultList:
+                shardResultsList = asyncResult.get(max(1, deadline - time.time()))
+                self.systemTestEnv.systemTestResultsList.extend(shardResultsList)
+        except:
+            excInfo = sys.exc_info()
+            pool.terminate()
+            pool.join()
+
+            # the workers were killed in the middle of their cleanup and the
+            # shards don't sweep the hosts themselves (see stopSharedCluster)
+            # => kill the remote processes of all shards now none is running
+            try:
+                kafka_system_test_utils.ps_grep_terminate_running_entity(self.systemTestEnv)
+            except Exception as e:
+                self.logger.warn("failed to stop the remote processes of the shards : %s", e, extra=self.d)
+            raise excInfo[0], excInfo[1], excInfo[2]
+
+        pool.join()
+
+    def isTestCasePassedInLastRun(self, testCasePathName, resultsManifestDict):
+        testcaseDirName   = os.path.basename(testCasePathName)
+        lastRunResultDict = resultsManifestDict.get(testcaseDirName)
+        if lastRunResultDict is None or lastRunResultDict.get("status") != "PASSED":
+            return False
+        if len(self.gitSha) == 0 or lastRunResultDict.get("git_sha") != self.gitSha:
+            return False
+
+        testcasePropJsonPathName  = system_test_utils.get_testcase_prop_json_pathname(testCasePathName)
+        testcaseConfigsList       = system_test_utils.get_json_list_data(testcasePropJsonPathName)
+        testcaseNonEntityDataDict = system_test_utils.get_json_dict_data(testcasePropJsonPathName)
+        configHash = system_test_utils.get_testcase_config_hash(testcaseConfigsList, testcaseNonEntityDataDict["testcase_args"])
+        return lastRunResultDict.get("config_hash") == configHash
+
+    def runTestcaseShard(self, shardId, numShards, testCasePathNameList):
+        self.shardId   = shardId
+        self.numShards = numShards
+
+        # return the results of the testcases run by this shard such that
+        # they can be merged into the parent process when running in a pool
+        resultsStartIndex = len(self.systemTestEnv.systemTestResultsList)
+
+        # the shards running concurrently don't share their ssh connections
+        # as they would exceed the max. no. of sessions per connection
+        if numShards > 1:
+            system_test_utils.use_ssh_control_path_suffix("shard_" + str(shardId) + "_")
+            system_test_utils.open_ssh_control_masters(self.systemTestEnv.clusterEntityConfigDictList)
+        try:
+            for testCasePathName in testCasePathNameList:
+                attempt = 0
+                while not self.runOneTestcase(testCasePathName, attempt):
+                    backoffSec = 2 ** attempt
+                    self.anonLogger.info("retrying %s in %s sec", os.path.basename(testCasePathName), backoffSec)
+                    time.sleep(backoffSec)
+                    attempt += 1
+        finally:
+            try:
+                self.stopSharedCluster()
+            finally:
+                if numShards > 1:
+                    system_test_utils.close_ssh_control_masters(self.systemTestEnv.clusterEntityConfigDictList)
+        return self.systemTestEnv.systemTestResultsList[resultsStartIndex:]
+
+    def stopSharedCluster(self):
+        if self.sharedClusterSignature is None:
+            return
+
+        self.log_message("stopping the shared zookeeper / broker cluster")
+        # systemTestEnv may hold the cluster config of the next testcase already
+        kafka_system_test_utils.stop_remote_entities(self.systemTestEnv,
+            self.testcaseEnv.entityBrokerParentPidDict, self.sharedClusterConfigDictList)
+        kafka_system_test_utils.stop_remote_entities(self.systemTestEnv,
+            self.testcaseEnv.entityZkParentPidDict, self.sharedClusterConfigDictList)
+
+        # make sure all entities are stopped. This kills every kafka process in
+        # the hosts and would take down the other shards' testcases as well
+        if self.numShards == 1:
+            kafka_system_test_utils.ps_grep_terminate_running_entity(self.systemTestEnv, self.sharedClusterConfigDictList)
+
+        # the pids may be reused by the OS => never signal them again
+        self.testcaseEnv.entityBrokerParentPidDict.clear()
+        self.testcaseEnv.entityZkParentPidDict.clear()
+
+        self.sharedClusterSignature = None
+        self.sharedClusterConfigDictList = None
+
+    def runOneTestcase(self, testCasePathName, attempt=0):
+        # returns False if this testcase failed with a retryable error and
+        # should be run again
+
+        testcaseDirName = os.path.basename(testCasePathName)
+        retryTestcase   = False
+
+        # printing the description only needs the testcase properties json file
+        if self.systemTestEnv.printTestDescriptionsOnly:
+            testcaseNonEntityDataDict = system_test_utils.get_json_dict_data(
+                system_test_utils.get_testcase_prop_json_pathname(testCasePathName))
+            system_test_utils.print_testcase_description(testcaseDirName, testcaseNonEntityDataDict)
+            return True
+
+        testcaseStatus = "FAILED"
+        configHash     = None
+        try: 
+            # ======================================================================
+            # A new instance of TestcaseEnv to keep track of this testcase's env vars
+            # and initialize some env vars as testCasePathName is available now
+            # ======================================================================
+            self.testcaseEnv = TestcaseEnv(self.systemTestEnv, self)
+            self.testcaseEnv.testSuiteBaseDir = self.testSuiteAbsPathName
+            self.testcaseEnv.initWithKnownTestCasePathName(testCasePathName)
+            self.testcaseEnv.testcaseArgumentsDict = self.testcaseEnv.testcaseNonEntityDataDict["testcase_args"]
+
+            self.testcaseEnv.printTestCaseDescription(testcaseDirName)
+            system_test_utils.setup_remote_hosts_with_testcase_level_cluster_config(self.systemTestEnv, testCasePathName)
+
+            # ============================================================================== #
+            # ============================================================================== #
+            #                   Product Specific Testing Code Starts Here:                   #
+            # ============================================================================== #
+            # ============================================================================== #
+
+            # initialize self.testcaseEnv with user-defined environment variables (product specific)
+            self.testcaseEnv.userDefinedEnvVarDict["zkConnectStr"] = ""
+            self.testcaseEnv.userDefinedEnvVarDict["stopBackgroundProducer"]    = False
+            self.testcaseEnv.userDefinedEnvVarDict["backgroundProducerStopped"] = False
+
+            # initialize signal handler
+            signal.signal(signal.SIGINT, self.signal_handler)
+
+            # create "LOCAL" log directories for metrics, dashboards for each entity under this testcase
+            # for collecting logs from remote machines
+            kafka_system_test_utils.generate_testcase_log_dirs(self.systemTestEnv, self.testcaseEnv)
+
+            # TestcaseEnv.testcaseConfigsList initialized by reading testcase properties file:
+            #   system_test/<suite_name>_testsuite/testcase_<n>/testcase_<n>_properties.json
+            self.testcaseEnv.testcaseConfigsList = system_test_utils.get_json_list_data(
+                self.testcaseEnv.testcasePropJsonPathName)
+
+            # hash of the testcase config before it is updated for this run
+            configHash = system_test_utils.get_testcase_config_hash(
+                self.testcaseEnv.testcaseConfigsList, self.testcaseEnv.testcaseArgumentsDict)
+
+            # shift the ports and data dirs away from the testcases running in the other shards
+            kafka_system_test_utils.apply_shard_offsets(self.systemTestEnv, self.testcaseEnv, self.shardId)
+
+            # ======================================================================
+            # the zookeeper / broker cluster left running by the previous testcase
+            # is reused if it has the same settings. Testcases which are destructive
+            # to the cluster (eg. bouncing brokers) always get their own cluster
+            # ======================================================================
+            clusterSignature = kafka_system_test_utils.get_zk_broker_cluster_signature(self.systemTestEnv, self.testcaseEnv)
+            isDestructive    = self.testcaseEnv.testcaseArgumentsDict.get("bounce_broker", "false").lower() == "true"
+            reuseCluster     = not isDestructive and clusterSignature == self.sharedClusterSignature
+
+            if reuseCluster:
+                # isolate this testcase from the previous ones in the same cluster by its own topics
+                kafka_system_test_utils.add_testcase_suffix_to_topics(self.testcaseEnv, testcaseDirName)
+            else:
+                self.stopSharedCluster()
+
+            # TestcaseEnv - initialize producer & consumer config / log file pathnames
+            kafka_system_test_utils.init_entity_props(self.systemTestEnv, self.testcaseEnv)
+
+            if reuseCluster:
+                # clean up the logs of this testcase only. Its topics are new to the
+                # running cluster as they are suffixed with the testcase name
+                kafka_system_test_utils.cleanup_data_at_remote_hosts(self.systemTestEnv, self.testcaseEnv, False)
+            else:
                 # clean up data directories specified in zookeeper.properties and kafka_server_<n>.properties
                 kafka_system_test_utils.cleanup_data_at_remote_hosts(self.systemTestEnv, self.testcaseEnv)
 
-                # generate remote hosts log/config dirs if not exist
-                kafka_system_test_utils.generate_testcase_log_dirs_in_remote_hosts(self.systemTestEnv, self.testcaseEnv)
-    
-                # generate properties files for zookeeper, kafka, producer, consumer and mirror-maker:
-                # 1. copy system_test/<suite_name>_testsuite/config/*.properties to 
-                #    system_test/<suite_name>_testsuite/testcase_<n>/config/
-                # 2. update all properties files in system_test/<suite_name>_testsuite/testcase_<n>/config
-                #    by overriding the settings specified in:
-                #    system_test/<suite_name>_testsuite/testcase_<n>/testcase_<n>_properties.json
-                kafka_system_test_utils.generate_overriden_props_files(self.testSuiteAbsPathName,
-                    self.testcaseEnv, self.systemTestEnv)
-
-                # =============================================
-                # preparing all entities to start the test
-                # =============================================
+            # generate remote hosts log/config dirs if not exist
+            kafka_system_test_utils.generate_testcase_log_dirs_in_remote_hosts(self.systemTestEnv, self.testcaseEnv)
+
+            # generate properties files for zookeeper, kafka, producer, consumer and mirror-maker:
+            # 1. copy system_test/<suite_name>_testsuite/config/*.properties to 
+            #    system_test/<suite_name>_testsuite/testcase_<n>/config/
+            # 2. update all properties files in system_test/<suite_name>_testsuite/testcase_<n>/config
+            #    by overriding the settings specified in:
+            #    system_test/<suite_name>_testsuite/testcase_<n>/testcase_<n>_properties.json
+            kafka_system_test_utils.generate_overriden_props_files(self.testSuiteAbsPathName,
+                self.testcaseEnv, self.systemTestEnv)
+
+            # =============================================
+            # preparing all entities to start the test
+            # =============================================
+            if reuseCluster:
+                self.log_message("reusing the running zookeepers and brokers")
+            else:
                 self.log_message("starting zookeepers")
                 kafka_system_test_utils.start_zookeepers(self.systemTestEnv, self.testcaseEnv)
-                self.anonLogger.info("sleeping for 2s")
-                time.sleep(2)
-        
+                kafka_system_test_utils.wait_for_zookeepers_ready(self.systemTestEnv, self.testcaseEnv, 30)
+
                 self.log_message("starting brokers")
                 kafka_system_test_utils.start_brokers(self.systemTestEnv, self.testcaseEnv)
-                self.anonLogger.info("sleeping for 5s")
-                time.sleep(5)
+                kafka_system_test_utils.wait_for_brokers_ready(self.systemTestEnv, self.testcaseEnv, 60)
+
+                # the broker logs and metrics of a shared cluster stay in the
+                # log dirs of the testcase which started it
+                self.sharedClusterSignature = clusterSignature
+                self.sharedClusterConfigDictList = copy.deepcopy(self.systemTestEnv.clusterEntityConfigDictList)
+
+            self.log_message("starting migration tool")
+            kafka_system_test_utils.start_migration_tool(self.systemTestEnv, self.testcaseEnv)
+            if not kafka_system_test_utils.wait_for_migration_tool_ready(self.systemTestEnv, self.testcaseEnv, 30):
+                self.logger.warn("migration tool not ready after 30 sec", extra=self.d)
+
+            # create_topic returns when the topics are created
+            self.log_message("creating topics")
+            kafka_system_test_utils.create_topic(self.systemTestEnv, self.testcaseEnv)
+
+            # =============================================
+            # starting producer 
+            # =============================================
+            self.log_message("starting producer in the background")
+            kafka_system_test_utils.start_producer_performance(self.systemTestEnv, self.testcaseEnv, True)
+            msgProducingFreeTimeSec = self.testcaseEnv.testcaseArgumentsDict["message_producing_free_time_sec"]
+            self.anonLogger.info("sleeping for %s sec to produce some messages", msgProducingFreeTimeSec)
+            time.sleep(int(msgProducingFreeTimeSec))
+
+            # =============================================
+            # A while-loop to bounce leader as specified
+            # by "num_iterations" in testcase_n_properties.json
+            # =============================================
+            i = 1
+            numIterations = int(self.testcaseEnv.testcaseArgumentsDict["num_iteration"])
+            bouncedEntityDownTimeSec = 1
+            try:
+                bouncedEntityDownTimeSec = int(self.testcaseEnv.testcaseArgumentsDict["bounced_entity_downtime_sec"])
+            except:
+                pass
+
+            # index of role => list of entity_id of this cluster as it
+            # doesn't change across the iterations
+            roleEntityIdListDict = {}
+            for clusterEntityConfigDict in self.systemTestEnv.clusterEntityConfigDictList:
+                roleEntityIdListDict.setdefault(clusterEntityConfigDict["role"], []).append(clusterEntityConfigDict["entity_id"])
+
+            migrationToolEntityIdList    = roleEntityIdListDict["migration_tool"]
+            stoppedMigrationToolEntityId = migrationToolEntityIdList[0]
+            migrationToolPPid            = self.testcaseEnv.entityMigrationToolParentPidDict[stoppedMigrationToolEntityId]
+
+            while i <= numIterations:
+
+                self.log_message("Iteration %s of %s", i, numIterations)
 
-                self.log_message("starting migration tool")
-                kafka_system_test_utils.start_migration_tool(self.systemTestEnv, self.testcaseEnv)
-                self.anonLogger.info("sleeping for 5s")
-                time.sleep(5)
-
-                self.log_message("creating topics")
-                kafka_system_test_utils.create_topic(self.systemTestEnv, self.testcaseEnv)
-                self.anonLogger.info("sleeping for 5s")
-                time.sleep(5)
-
-                # =============================================
-                # starting producer 
                 # =============================================
-                self.log_message("starting producer in the background")
-                kafka_system_test_utils.start_producer_performance(self.systemTestEnv, self.testcaseEnv, True)
-                msgProducingFreeTimeSec = self.testcaseEnv.testcaseArgumentsDict["message_producing_free_time_sec"]
-                self.anonLogger.info("sleeping for " + msgProducingFreeTimeSec + " sec to produce some messages")
-                time.sleep(int(msgProducingFreeTimeSec))
-
-                # =============================================
-                # A while-loop to bounce leader as specified
-                # by "num_iterations" in testcase_n_properties.json
+                # Bounce Migration Tool
                 # =============================================
-                i = 1
-                numIterations = int(self.testcaseEnv.testcaseArgumentsDict["num_iteration"])
-                bouncedEntityDownTimeSec = 1
-                try:
-                    bouncedEntityDownTimeSec = int(self.testcaseEnv.testcaseArgumentsDict["bounced_entity_downtime_sec"])
-                except:
-                    pass
-
-                while i <= numIterations:
-
-                    self.log_message("Iteration " + str(i) + " of " + str(numIterations))
-
-                    # =============================================
-                    # Bounce Migration Tool
-                    # =============================================
-                    bounceMigrationTool = self.testcaseEnv.testcaseArgumentsDict["bounce_migration_tool"]
-                    self.log_message("bounce_migration_tool flag : " + bounceMigrationTool)
-                    if (bounceMigrationTool.lower() == "true"):
-
-                        clusterConfigList         = self.systemTestEnv.clusterEntityConfigDictList
-                        migrationToolEntityIdList = system_test_utils.get_data_from_list_of_dicts(
-                                                    clusterConfigList, "role", "migration_tool", "entity_id")
-
-                        stoppedMigrationToolEntityId = migrationToolEntityIdList[0]
-                        migrationToolPPid = self.testcaseEnv.entityMigrationToolParentPidDict[stoppedMigrationToolEntityId]
-
-                        self.log_message("stopping migration tool : " + migrationToolPPid)
-                        kafka_system_test_utils.stop_remote_entity(self.systemTestEnv, stoppedMigrationToolEntityId, migrationToolPPid)
-                        self.anonLogger.info("sleeping for " + str(bouncedEntityDownTimeSec) + " sec")
-                        time.sleep(bouncedEntityDownTimeSec)
-
-                        # starting previously terminated broker 
-                        self.log_message("starting the previously terminated migration tool")
-                        kafka_system_test_utils.start_migration_tool(self.systemTestEnv, self.testcaseEnv, stoppedMigrationToolEntityId)
-
-                    self.anonLogger.info("sleeping for 15s")
-                    time.sleep(15)
-                    i += 1
-                # while loop
-
-                # =============================================
-                # tell producer to stop
-                # =============================================
-                self.testcaseEnv.lock.acquire()
-                self.testcaseEnv.userDefinedEnvVarDict["stopBackgroundProducer"] = True
-                time.sleep(1)
-                self.testcaseEnv.lock.release()
-                time.sleep(1)
-
-                # =============================================
-                # wait for producer thread's update of
-                # "backgroundProducerStopped" to be "True"
-                # =============================================
-                while 1:
-                    self.testcaseEnv.lock.acquire()
-                    self.logger.info("status of backgroundProducerStopped : [" + \
-                        str(self.testcaseEnv.userDefinedEnvVarDict["backgroundProducerStopped"]) + "]", extra=self.d)
-                    if self.testcaseEnv.userDefinedEnvVarDict["backgroundProducerStopped"]:
-                        time.sleep(1)
-                        self.logger.info("all producer threads completed", extra=self.d)
-                        break
-                    time.sleep(1)
-                    self.testcaseEnv.lock.release()
-                    time.sleep(2)
-
-                #print "\n\n#### sleeping for 30 min ...\n\n"
-                #time.sleep(1800)
+                bounceMigrationTool = self.testcaseEnv.testcaseArgumentsDict["bounce_migration_tool"]
+                self.log_message("bounce_migration_tool flag : %s", bounceMigrationTool)
+                if (bounceMigrationTool.lower() == "true"):
+
+                    self.log_message("stopping migration tool : %s", migrationToolPPid)
+                    kafka_system_test_utils.stop_remote_entity(self.systemTestEnv, stoppedMigrationToolEntityId, migrationToolPPid)
+                    self.anonLogger.info("sleeping for %s sec", bouncedEntityDownTimeSec)
+                    time.sleep(bouncedEntityDownTimeSec)
+
+                    # starting previously terminated broker 
+                    self.log_message("starting the previously terminated migration tool")
+                    kafka_system_test_utils.start_migration_tool(self.systemTestEnv, self.testcaseEnv, stoppedMigrationToolEntityId)
+                    if not kafka_system_test_utils.wait_for_migration_tool_ready(self.systemTestEnv, self.testcaseEnv,
+                                                                                 30, stoppedMigrationToolEntityId):
+                        self.logger.warn("migration tool not ready after 30 sec", extra=self.d)
+
+                    # the restarted migration tool has a new ppid
+                    migrationToolPPid = self.testcaseEnv.entityMigrationToolParentPidDict[stoppedMigrationToolEntityId]
+
+                self.anonLogger.info("waiting up to 15s for the producer to produce more messages")
+                kafka_system_test_utils.wait_for_producer_progress(self.systemTestEnv, self.testcaseEnv, 15)
+                i += 1
+            # while loop
+
+            # =============================================
+            # tell producer to stop
+            # =============================================
+            self.testcaseEnv.lock.acquire()
+            self.testcaseEnv.userDefinedEnvVarDict["stopBackgroundProducer"] = True
+            time.sleep(1)
+            self.testcaseEnv.lock.release()
+            time.sleep(1)
+
+            # =============================================
+            # wait for producer thread to signal that all
+            # producer threads have stopped. A timed wait
+            # keeps the main thread interruptible by Ctrl+c
+            # =============================================
+            while not self.testcaseEnv.backgroundProducerStoppedEvent.wait(1):
+                pass
+            self.logger.info("all producer threads completed", extra=self.d)
+
+            #print "\n\n#### sleeping for 30 min ...\n\n"
+            #time.sleep(1800)
+            
+            # =============================================
+            # starting consumer
+            # =============================================
+            self.log_message("starting consumer in the background")
+            kafka_system_test_utils.start_console_consumer(self.systemTestEnv, self.testcaseEnv)
+            kafka_system_test_utils.wait_for_console_consumers_stopped(self.systemTestEnv, self.testcaseEnv, 60)
                 
-                # =============================================
-                # starting consumer
-                # =============================================
-                self.log_message("starting consumer in the background")
-                kafka_system_test_utils.start_console_consumer(self.systemTestEnv, self.testcaseEnv)
-                self.anonLogger.info("sleeping for 20s")
-                time.sleep(20)
-                    
-                # =============================================
-                # this testcase is completed - stop all entities
-                # =============================================
-                self.log_message("stopping all entities")
-                for entityId, parentPid in self.testcaseEnv.entityBrokerParentPidDict.items():
-                    kafka_system_test_utils.stop_remote_entity(self.systemTestEnv, entityId, parentPid)
-
-                for entityId, parentPid in self.testcaseEnv.entityZkParentPidDict.items():
-                    kafka_system_test_utils.stop_remote_entity(self.systemTestEnv, entityId, parentPid)
-
-                # make sure all entities are stopped
-                kafka_system_test_utils.ps_grep_terminate_running_entity(self.systemTestEnv)
-
-                # =============================================
-                # collect logs from remote hosts
-                # =============================================
-                kafka_system_test_utils.collect_logs_from_remote_hosts(self.systemTestEnv, self.testcaseEnv)
-    
-                # =============================================
-                # validate the data matched and checksum
-                # =============================================
+            # =============================================
+            # this testcase is completed - stop all entities
+            # except a zookeeper / broker cluster which can
+            # be shared with the next testcase
+            # =============================================
+            self.log_message("stopping all entities")
+            kafka_system_test_utils.stop_all_remote_running_processes(self.systemTestEnv, self.testcaseEnv, False)
+            if isDestructive:
+                self.stopSharedCluster()
+
+            # =============================================
+            # collect logs from remote hosts
+            # =============================================
+            kafka_system_test_utils.collect_logs_from_remote_hosts(self.systemTestEnv, self.testcaseEnv)
+
+            # =============================================
+            # draw graphs and build dashboard, one for each
+            # role, in the background while validating
+            # =============================================
+            drawGraphsCall = system_test_utils.BackgroundCall(metrics.draw_all_graphs,
+                                 (self.systemTestEnv.METRICS_PATHNAME,
+                                  self.testcaseEnv,
+                                  self.systemTestEnv.clusterEntityConfigDictList))
+            buildDashboardsCall = system_test_utils.BackgroundCall(metrics.build_all_dashboards,
+                                      (self.systemTestEnv.METRICS_PATHNAME,
+                                       self.testcaseEnv.testCaseDashboardsDir,
+                                       self.systemTestEnv.clusterEntityConfigDictList))
+            drawGraphsCall.start()
+            buildDashboardsCall.start()
+
+            # =============================================
+            # validate the data matched and checksum
+            # =============================================
+            validateExcInfo = None
+            try:
                 self.log_message("validating data matched")
                 kafka_system_test_utils.validate_07_08_migrated_data_matched(self.systemTestEnv, self.testcaseEnv)
                 kafka_system_test_utils.validate_broker_log_segment_checksum(self.systemTestEnv, self.testcaseEnv)
-
-                # =============================================
-                # draw graphs
-                # =============================================
-                metrics.draw_all_graphs(self.systemTestEnv.METRICS_PATHNAME, 
-                                        self.testcaseEnv, 
-                                        self.systemTestEnv.clusterEntityConfigDictList)
-                
-                # build dashboard, one for each role
-                metrics.build_all_dashboards(self.systemTestEnv.METRICS_PATHNAME,
-                                             self.testcaseEnv.testCaseDashboardsDir,
-                                             self.systemTestEnv.clusterEntityConfigDictList)
-                
-            except Exception as e:
-                self.log_message("Exception while running test {0}".format(e))
+            except BaseException:
+                validateExcInfo = sys.exc_info()
+            system_test_utils.join_background_calls([drawGraphsCall, buildDashboardsCall], validateExcInfo)
+
+            if "FAILED" not in self.testcaseEnv.validationStatusDict.values():
+                testcaseStatus = "PASSED"
+
+        except kafka_system_test_utils.RETRYABLE as e:
+            # the cluster may be left in a bad state => don't share it with the next attempt
+            self.stopSharedCluster()
+
+            if attempt + 1 < MAX_TESTCASE_ATTEMPTS:
+                self.logger.warn("attempt %s of %s of %s failed : %s", attempt + 1, MAX_TESTCASE_ATTEMPTS,
+                                 testcaseDirName, e, extra=self.d)
+                retryTestcase = True
+
+                # only the results of the last attempt are reported
+                self.systemTestEnv.systemTestResultsList.remove(self.testcaseEnv.testcaseResultsDict)
+            else:
+                self.log_message("Exception while running test %s (attempt %s of %s)", e, attempt + 1, MAX_TESTCASE_ATTEMPTS)
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    traceback.print_exc()
+
+        except Exception as e:
+            self.log_message("Exception while running test %s", e)
+            if self.logger.isEnabledFor(logging.DEBUG):
                 traceback.print_exc()
 
+            # the cluster may be left in a bad state => don't share it with the next testcase
+            self.stopSharedCluster()
+
+        finally:
+            # =============================================
+            # record the result of this testcase such that
+            # it can be skipped with --resume if PASSED. An
+            # exception or a retry records FAILED such that
+            # the PASSED of an earlier run is overwritten
+            # =============================================
+            try:
+                system_test_utils.update_results_manifest(self.resultsManifestPathName, testcaseDirName,
+                    {"status" : testcaseStatus, "git_sha" : self.gitSha, "config_hash" : configHash})
             finally:
-                if not skipThisTestCase and not self.systemTestEnv.printTestDescriptionsOnly:
-                    self.log_message("stopping all entities - please wait ...")
-                    kafka_system_test_utils.stop_all_remote_running_processes(self.systemTestEnv, self.testcaseEnv)
+                self.log_message("stopping all entities - please wait ...")
+                kafka_system_test_utils.stop_all_remote_running_processes(self.systemTestEnv, self.testcaseEnv,
+                    self.sharedClusterSignature is None)
+
+        return not retryTestcase
 
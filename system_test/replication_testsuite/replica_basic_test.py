@@ -75,7 +75,6 @@ class ReplicaBasicTest(ReplicationUtils, SetupUtils):
         # ======================================================================
         testCasePathNameList = system_test_utils.get_dir_paths_with_prefix(
             self.testSuiteAbsPathName, SystemTestEnv.SYSTEM_TEST_CASE_PREFIX)
-        testCasePathNameList.sort()
 
         # =============================================================
         # launch each testcase one by one: testcase_1, testcase_2, ...
@@ -352,8 +351,8 @@ class ReplicaBasicTest(ReplicationUtils, SetupUtils):
                 # =============================================
                 while 1:
                     self.testcaseEnv.lock.acquire()
-                    self.logger.info("status of backgroundProducerStopped : [" + \
-                        str(self.testcaseEnv.userDefinedEnvVarDict["backgroundProducerStopped"]) + "]", extra=self.d)
+                    self.logger.info("status of backgroundProducerStopped : [%s]",
+                        self.testcaseEnv.userDefinedEnvVarDict["backgroundProducerStopped"], extra=self.d)
                     if self.testcaseEnv.userDefinedEnvVarDict["backgroundProducerStopped"]:
                         time.sleep(1)
                         self.logger.info("all producer threads completed", extra=self.d)
@@ -448,3 +447,7 @@ class ReplicaBasicTest(ReplicationUtils, SetupUtils):
                     self.log_message("stopping all entities - please wait ...")
                     kafka_system_test_utils.stop_all_remote_running_processes(self.systemTestEnv, self.testcaseEnv)
 
+                    # the hosts of the next testcase may differ => don't leave the
+                    # ssh connections of this testcase open
+                    system_test_utils.close_ssh_control_masters(self.systemTestEnv.clusterEntityConfigDictList)
+
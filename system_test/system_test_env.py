@@ -48,6 +48,8 @@ class SystemTestEnv():
     TESTCASE_TO_RUN_PATHNAME  = os.path.abspath(SYSTEM_TEST_BASE_DIR + "/" + TESTCASE_TO_RUN_FILENAME)
     TESTCASE_TO_SKIP_FILENAME = "testcase_to_skip.json"
     TESTCASE_TO_SKIP_PATHNAME = os.path.abspath(SYSTEM_TEST_BASE_DIR + "/" + TESTCASE_TO_SKIP_FILENAME)
+    RESULTS_MANIFEST_DIRNAME  = "logs"
+    RESULTS_MANIFEST_FILENAME = "results_manifest.json"
 
     clusterEntityConfigDictList                      = []   # cluster entity config for current level
     clusterEntityConfigDictListInSystemTestLevel     = []   # cluster entity config defined in system level
@@ -60,6 +62,7 @@ class SystemTestEnv():
 
     printTestDescriptionsOnly    = False
     doNotValidateRemoteHost      = False
+    resume                       = False
 
     def __init__(self):
         "Create an object with this system test session environment"
@@ -69,6 +69,12 @@ def main():
                             action="store_true",
                             help="do not validate remote host (due to different kafka versions are installed)")
 
+    optionParser.add_option("-r", "--resume",
+                            dest="resume",
+                            default=False,
+                            action="store_true",
+                            help="skip the testcases passed in the last run with the same commit and config (see <testsuite>/logs/results_manifest.json)")
+
     (options, args) = optionParser.parse_args()
 
     print "\n"
@@ -87,6 +93,8 @@ def main():
         systemTestEnv.printTestDescriptionsOnly = True
     if options.doNotValidateRemoteHost:
         systemTestEnv.doNotValidateRemoteHost = True
+    if options.resume:
+        systemTestEnv.resume = True
 
     if not systemTestEnv.printTestDescriptionsOnly:
         if not systemTestEnv.doNotValidateRemoteHost:
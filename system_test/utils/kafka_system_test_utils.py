@@ -29,6 +29,7 @@ import logging
 import os
 import pprint
 import re
+import socket
 import subprocess
 import sys
 import thread
@@ -60,6 +61,31 @@ d = {'name_of_class': thisClassName}
 
 anonLogger = logging.getLogger("anonymousLogger")
 
+# testcases running concurrently in different shards share the same hosts.
+# The ports of all entities in shard <n> are shifted by n * SHARD_PORT_OFFSET
+# such that they keep the same last 3 digits and never collide across shards.
+# The shifted ports must stay below the Linux ephemeral port range (which
+# starts at 32768) as the ports of the outgoing connections are taken from it.
+# The ports of all testcases are below MAX_BASE_PORT.
+SHARD_PORT_OFFSET      = 1000
+MAX_BASE_PORT          = 10000
+EPHEMERAL_PORT_MIN     = 32768
+MAX_NUM_SHARDS         = (EPHEMERAL_PORT_MIN - MAX_BASE_PORT) // SHARD_PORT_OFFSET
+
+
+class ZkConnectTimeout(Exception):
+    pass
+
+class BrokerStartupTimeout(Exception):
+    pass
+
+class PortInUse(Exception):
+    pass
+
+# failures of a testcase which are usually transient (such as a port not
+# released yet by the previous testcase) => the testcase can be run again
+RETRYABLE = (ZkConnectTimeout, BrokerStartupTimeout, PortInUse)
+
 
 # =====================================
 # Sample usage of getting testcase env
@@ -119,14 +145,48 @@ def generate_testcase_log_dirs(systemTestEnv, testcaseEnv):
         if not os.path.exists(dashboardsRoleDir) : os.makedirs(dashboardsRoleDir)
         
 
+# file in the broker log dir holding the md5 checksum of the merged log
+# segments of each topic-partition in the form of "<topic-partition> <md5>"
+LOG_SEGMENT_CHECKSUMS_FILENAME = "log_segment_checksums.txt"
+
+# suffix of the file holding "<no. of msgs> <no. of unique msgs> <md5>" of
+# the message checksums in a producer / consumer log
+MSG_CHECKSUM_SUMMARY_SUFFIX = ".checksum_summary"
+
+def get_remote_log_segment_checksums_cmd_str(hostname, dataLogPathName, logPathName):
+    # md5 of the sorted *.log segment files of each topic-partition dir,
+    # computed on the remote host such that the segments are not read twice.
+    # The file is truncated first such that a missing log dir never leaves
+    # the checksums of a previous run behind
+    checksumsPathName = logPathName + "/" + LOG_SEGMENT_CHECKSUMS_FILENAME
+    return system_test_utils.SSH_CMD + " " + hostname + " ': > " + checksumsPathName + "; " + \
+           "cd " + dataLogPathName + " && " + \
+           "for tp in *; do if [ -d $tp ]; then " + \
+           "echo $tp $(cat /dev/null $(ls $tp/*.log 2> /dev/null | LC_ALL=C sort) | md5sum | cut -c1-32); " + \
+           "fi; done > " + checksumsPathName + "'"
+
+def get_remote_msg_checksum_summary_cmd_str(hostname, logFilePathName):
+    # the summary is truncated first such that a missing log never leaves
+    # the summary of a previous run behind
+    checksumsCmdStr = "grep checksum: " + logFilePathName + " | sed \"s/.*checksum:\\([0-9]*\\).*/\\1/\""
+    summaryPathName = logFilePathName + MSG_CHECKSUM_SUMMARY_SUFFIX
+    return system_test_utils.SSH_CMD + " " + hostname + " ': > " + summaryPathName + "; " + \
+           "if [ -f " + logFilePathName + " ]; then " + \
+           "echo $(" + checksumsCmdStr + " | wc -l) " + \
+           "$(" + checksumsCmdStr + " | LC_ALL=C sort -u | wc -l) " + \
+           "$(" + checksumsCmdStr + " | LC_ALL=C sort -u | md5sum | cut -c1-32) " + \
+           "> " + summaryPathName + "; fi'"
+
 def collect_logs_from_remote_hosts(systemTestEnv, testcaseEnv):
     anonLogger.info("================================================")
     anonLogger.info("collecting logs from remote machines")
     anonLogger.info("================================================")
 
-    testCaseBaseDir = testcaseEnv.testCaseBaseDir
-    tcConfigsList   = testcaseEnv.testcaseConfigsList
-
+    # group the rsync commands by hostname such that there is a single
+    # subprocess per remote host. The checksums are computed on the remote
+    # hosts before the rsync such that they are collected with the logs
+    hostChecksumCmdStrListDict = {}
+    hostCmdStrListDict = {}
     for clusterEntityConfigDict in systemTestEnv.clusterEntityConfigDictList:
         hostname   = clusterEntityConfigDict["hostname"]
         entity_id  = clusterEntityConfigDict["entity_id"]
@@ -136,94 +196,91 @@ def collect_logs_from_remote_hosts(systemTestEnv, testcaseEnv):
         logger.debug("hostname  : " + hostname,  extra=d)
         logger.debug("role      : " + role,      extra=d)
 
-        configPathName     = get_testcase_config_log_dir_pathname(testcaseEnv, role, entity_id, "config")
-        metricsPathName    = get_testcase_config_log_dir_pathname(testcaseEnv, role, entity_id, "metrics")
-        logPathName        = get_testcase_config_log_dir_pathname(testcaseEnv, role, entity_id, "default")
-
-        # ==============================
-        # collect entity log file
-        # ==============================
-        cmdList = ["scp",
-                   hostname + ":" + logPathName + "/*",
-                   logPathName]
-        cmdStr  = " ".join(cmdList)
-        logger.debug("executing command [" + cmdStr + "]", extra=d)
-        system_test_utils.sys_call(cmdStr)
+        if hostname not in hostCmdStrListDict:
+            # ==============================
+            # collect entity log, metrics and dashboards files
+            # ==============================
+            cmdList = ["rsync -az --partial " + system_test_utils.RSYNC_SSH_OPT,
+                       hostname + ":" + testcaseEnv.testCaseLogsDir + "/",
+                       testcaseEnv.testCaseLogsDir]
+            hostCmdStrListDict[hostname] = [" ".join(cmdList)]
+            hostChecksumCmdStrListDict[hostname] = []
 
-        # ==============================
-        # collect entity metrics file
-        # ==============================
-        cmdList = ["scp",
-                   hostname + ":" + metricsPathName + "/*",
-                   metricsPathName]
-        cmdStr  = " ".join(cmdList)
-        logger.debug("executing command [" + cmdStr + "]", extra=d)
-        system_test_utils.sys_call(cmdStr)
+        logPathName = get_testcase_config_log_dir_pathname(testcaseEnv, role, entity_id, "default")
 
         # ==============================
-        # collect broker log segment file
+        # checksums of broker log segments and producer / consumer messages
         # ==============================
         if role == "broker":
             dataLogPathName = system_test_utils.get_data_by_lookup_keyval(
                                   testcaseEnv.testcaseConfigsList, "entity_id", entity_id, "log.dir")
-
-            cmdList = ["scp -r",
-                       hostname + ":" + dataLogPathName,
-                       logPathName]
-            cmdStr  = " ".join(cmdList)
-            logger.debug("executing command [" + cmdStr + "]", extra=d)
-            system_test_utils.sys_call(cmdStr)
+            hostChecksumCmdStrListDict[hostname].append(
+                get_remote_log_segment_checksums_cmd_str(hostname, dataLogPathName, logPathName))
+        elif role == "producer_performance":
+            hostChecksumCmdStrListDict[hostname].append(
+                get_remote_msg_checksum_summary_cmd_str(hostname, logPathName + "/producer_performance.log"))
+        elif role == "console_consumer":
+            hostChecksumCmdStrListDict[hostname].append(
+                get_remote_msg_checksum_summary_cmd_str(hostname, logPathName + "/console_consumer.log"))
 
         # ==============================
-        # collect ZK log
+        # collect broker log segment file / ZK log
         # ==============================
-        if role == "zookeeper":
+        dataLogPathName = None
+        if role == "broker":
+            dataLogPathName = system_test_utils.get_data_by_lookup_keyval(
+                                  testcaseEnv.testcaseConfigsList, "entity_id", entity_id, "log.dir")
+        elif role == "zookeeper":
             dataLogPathName = system_test_utils.get_data_by_lookup_keyval(
                                   testcaseEnv.testcaseConfigsList, "entity_id", entity_id, "dataDir")
 
-            cmdList = ["scp -r",
+        if dataLogPathName is not None:
+            cmdList = ["rsync -az --partial " + system_test_utils.RSYNC_SSH_OPT,
                        hostname + ":" + dataLogPathName,
                        logPathName]
-            cmdStr  = " ".join(cmdList)
-            logger.debug("executing command [" + cmdStr + "]", extra=d)
-            system_test_utils.sys_call(cmdStr)
+            hostCmdStrListDict[hostname].append(" ".join(cmdList))
 
-    # ==============================
-    # collect dashboards file
-    # ==============================
-    dashboardsPathName = get_testcase_config_log_dir_pathname(testcaseEnv, role, entity_id, "dashboards")
-    cmdList = ["scp",
-               hostname + ":" + dashboardsPathName + "/*",
-               dashboardsPathName]
-    cmdStr  = " ".join(cmdList)
-    logger.debug("executing command [" + cmdStr + "]", extra=d)
-    system_test_utils.sys_call(cmdStr)
+    # spawn all, then wait for all
+    subprocList = []
+    for hostname, cmdStrList in hostCmdStrListDict.items():
+        cmdStr = " ; ".join(hostChecksumCmdStrListDict[hostname] + cmdStrList)
+        logger.debug("executing command [" + cmdStr + "]", extra=d)
+        subprocList.append(system_test_utils.sys_call_return_subproc(cmdStr))
+
+    for subproc in subprocList:
+        subproc.communicate()
 
  
 def generate_testcase_log_dirs_in_remote_hosts(systemTestEnv, testcaseEnv):
-    testCaseBaseDir = testcaseEnv.testCaseBaseDir
-
+    argsList = []
     for clusterEntityConfigDict in systemTestEnv.clusterEntityConfigDictList:
-        hostname   = clusterEntityConfigDict["hostname"]
-        entity_id  = clusterEntityConfigDict["entity_id"]
-        role       = clusterEntityConfigDict["role"]
+        argsList.append((clusterEntityConfigDict, testcaseEnv))
 
-        logger.debug("entity_id : " + entity_id, extra=d)
-        logger.debug("hostname  : " + hostname, extra=d)
-        logger.debug("role      : " + role, extra=d)
-
-        configPathName     = get_testcase_config_log_dir_pathname(testcaseEnv, role, entity_id, "config")
-        metricsPathName    = get_testcase_config_log_dir_pathname(testcaseEnv, role, entity_id, "metrics")
-        dashboardsPathName = get_testcase_config_log_dir_pathname(testcaseEnv, role, entity_id, "dashboards")
-
-        cmdList = ["ssh " + hostname,
-                   "'mkdir -p",
-                   configPathName,
-                   metricsPathName,
-                   dashboardsPathName + "'"]
-        cmdStr  = " ".join(cmdList)
-        logger.debug("executing command [" + cmdStr + "]", extra=d)
-        system_test_utils.sys_call(cmdStr)
+    # generate the dirs of all entities concurrently
+    system_test_utils.run_in_parallel(generate_entity_log_dirs_in_remote_host, argsList)
+
+
+def generate_entity_log_dirs_in_remote_host(clusterEntityConfigDict, testcaseEnv):
+    hostname   = clusterEntityConfigDict["hostname"]
+    entity_id  = clusterEntityConfigDict["entity_id"]
+    role       = clusterEntityConfigDict["role"]
+
+    logger.debug("entity_id : " + entity_id, extra=d)
+    logger.debug("hostname  : " + hostname, extra=d)
+    logger.debug("role      : " + role, extra=d)
+
+    configPathName     = get_testcase_config_log_dir_pathname(testcaseEnv, role, entity_id, "config")
+    metricsPathName    = get_testcase_config_log_dir_pathname(testcaseEnv, role, entity_id, "metrics")
+    dashboardsPathName = get_testcase_config_log_dir_pathname(testcaseEnv, role, entity_id, "dashboards")
+
+    cmdList = [system_test_utils.SSH_CMD + " " + hostname,
+               "'mkdir -p",
+               configPathName,
+               metricsPathName,
+               dashboardsPathName + "'"]
+    cmdStr  = " ".join(cmdList)
+    logger.debug("executing command [" + cmdStr + "]", extra=d)
+    system_test_utils.sys_call(cmdStr)
 
 
 def init_entity_props(systemTestEnv, testcaseEnv):
@@ -262,25 +319,67 @@ def init_entity_props(systemTestEnv, testcaseEnv):
     testcaseEnv.userDefinedEnvVarDict["producerConfigPathName"] = prodCfgPathname
 
 
+def apply_shard_offsets(systemTestEnv, testcaseEnv, shardId):
+    # shift the ports (jmx, zookeeper, broker) and the data directories of all
+    # entities in this testcase by the shard id such that testcases running
+    # concurrently in other shards do not collide. shard 0 is left unchanged.
+    if shardId == 0:
+        return
+
+    portOffset = shardId * SHARD_PORT_OFFSET
+    logger.info("applying port offset [" + str(portOffset) + "] for shard [" + str(shardId) + "]", extra=d)
+
+    for clusterEntityConfigDict in systemTestEnv.clusterEntityConfigDictList:
+        clusterEntityConfigDict["jmx_port"] = get_shifted_port(clusterEntityConfigDict["jmx_port"], portOffset)
+
+    for tcCfg in testcaseEnv.testcaseConfigsList:
+        for portKey in ["port", "clientPort"]:
+            if portKey in tcCfg:
+                tcCfg[portKey] = get_shifted_port(tcCfg[portKey], portOffset)
+        for dirKey in ["dataDir", "log.dir"]:
+            if dirKey in tcCfg:
+                tcCfg[dirKey] = tcCfg[dirKey] + "_shard_" + str(shardId)
+
+
+def get_shifted_port(port, portOffset):
+    if int(port) >= MAX_BASE_PORT:
+        raise Exception("port [" + port + "] is not below " + str(MAX_BASE_PORT) + " : it can't be shifted by shard")
+    return str(int(port) + portOffset)
+
+
 def copy_file_with_dict_values(srcFile, destFile, dictObj, keyValToAddDict):
     infile  = open(srcFile, "r")
     inlines = infile.readlines()
     infile.close()
 
-    outfile = open(destFile, 'w')
+    write_lines_with_dict_values(inlines, destFile, dictObj, keyValToAddDict)
+
+def write_lines_with_dict_values(inlines, destFile, dictObj, keyValToAddDict):
+    # inlines are the lines of a .properties template. The value of a line
+    # "key=value" is replaced if the key is found in dictObj
+    outlines = []
     for line in inlines:
-        for key in dictObj.keys():
-            if (line.startswith(key + "=")):
-                line = key + "=" + dictObj[key] + "\n"
-        outfile.write(line)
+        key = line.split("=", 1)[0]
+        if "=" in line and key in dictObj:
+            line = key + "=" + dictObj[key] + "\n"
+        outlines.append(line)
 
     if (keyValToAddDict is not None):
         for key in sorted(keyValToAddDict.iterkeys()):
-            line = key + "=" + keyValToAddDict[key] + "\n"
-            outfile.write(line)
+            outlines.append(key + "=" + keyValToAddDict[key] + "\n")
 
+    outfile = open(destFile, 'w')
+    outfile.write("".join(outlines))
     outfile.close()
 
+def read_props_template_lines(pathname, templateLinesDict):
+    # read each .properties template once and keep its lines in templateLinesDict
+    if pathname not in templateLinesDict:
+        infile = open(pathname, "r")
+        templateLinesDict[pathname] = infile.readlines()
+        infile.close()
+    return templateLinesDict[pathname]
+
 def generate_overriden_props_files(testsuitePathname, testcaseEnv, systemTestEnv):
     logger.info("calling generate_properties_files", extra=d)
 
@@ -380,6 +479,9 @@ def generate_overriden_props_files(testsuitePathname, testcaseEnv, systemTestEnv
             raise Exception("Invalid cluster name : " + clusterName)
             sys.exit(1)
 
+    # lines of each .properties template read so far
+    templateLinesDict = {}
+
     # for each entity in the cluster config
     for clusterCfg in clusterConfigsList:
         cl_entity_id = clusterCfg["entity_id"]
@@ -404,16 +506,16 @@ def generate_overriden_props_files(testsuitePathname, testcaseEnv, systemTestEnv
                     addedCSVConfig["kafka.metrics.polling.interval.secs"] = "5" 
                     addedCSVConfig["kafka.metrics.reporters"] = "kafka.metrics.KafkaCSVMetricsReporter" 
                     addedCSVConfig["kafka.csv.metrics.reporter.enabled"] = "true"
-                    copy_file_with_dict_values(cfgTemplatePathname + "/server.properties",
+                    write_lines_with_dict_values(read_props_template_lines(cfgTemplatePathname + "/server.properties", templateLinesDict),
                         cfgDestPathname + "/" + tcCfg["config_filename"], tcCfg, addedCSVConfig)
 
                 elif ( clusterCfg["role"] == "zookeeper"):
                     if clusterCfg["cluster_name"] == "source":
-                        copy_file_with_dict_values(cfgTemplatePathname + "/zookeeper.properties",
+                        write_lines_with_dict_values(read_props_template_lines(cfgTemplatePathname + "/zookeeper.properties", templateLinesDict),
                             cfgDestPathname + "/" + tcCfg["config_filename"], tcCfg,
                             testcaseEnv.userDefinedEnvVarDict["sourceZkHostPortDict"])
                     elif clusterCfg["cluster_name"] == "target":
-                        copy_file_with_dict_values(cfgTemplatePathname + "/zookeeper.properties",
+                        write_lines_with_dict_values(read_props_template_lines(cfgTemplatePathname + "/zookeeper.properties", templateLinesDict),
                             cfgDestPathname + "/" + tcCfg["config_filename"], tcCfg,
                             testcaseEnv.userDefinedEnvVarDict["targetZkHostPortDict"])
                     else:
@@ -422,14 +524,31 @@ def generate_overriden_props_files(testsuitePathname, testcaseEnv, systemTestEnv
 
                 elif ( clusterCfg["role"] == "mirror_maker"):
                     tcCfg["broker.list"] = testcaseEnv.userDefinedEnvVarDict["targetBrokerList"]
-                    copy_file_with_dict_values(cfgTemplatePathname + "/mirror_producer.properties",
+                    write_lines_with_dict_values(read_props_template_lines(cfgTemplatePathname + "/mirror_producer.properties", templateLinesDict),
                         cfgDestPathname + "/" + tcCfg["mirror_producer_config_filename"], tcCfg, None)
 
                     # update zk.connect with the zk entities specified in cluster_config.json
                     tcCfg["zk.connect"] = testcaseEnv.userDefinedEnvVarDict["sourceZkConnectStr"]
-                    copy_file_with_dict_values(cfgTemplatePathname + "/mirror_consumer.properties",
+                    write_lines_with_dict_values(read_props_template_lines(cfgTemplatePathname + "/mirror_consumer.properties", templateLinesDict),
                         cfgDestPathname + "/" + tcCfg["mirror_consumer_config_filename"], tcCfg, None)
-                
+
+                elif ( clusterCfg["role"] == "migration_tool"):
+                    # the migration tool consumes from the source (0.7) zookeeper and produces
+                    # to the target (0.8) brokers: point its configs at the ports of this testcase
+                    migrationProducerCfgPathName = cfgDestPathname + "/" + os.path.basename(tcCfg["producer.config"])
+                    write_lines_with_dict_values(read_props_template_lines(systemTestEnv.SYSTEM_TEST_BASE_DIR + "/" + tcCfg["producer.config"], templateLinesDict),
+                        migrationProducerCfgPathName,
+                        {"broker.list" : testcaseEnv.userDefinedEnvVarDict["targetBrokerList"]}, None)
+
+                    migrationConsumerCfgPathName = cfgDestPathname + "/" + os.path.basename(tcCfg["consumer.config"])
+                    write_lines_with_dict_values(read_props_template_lines(systemTestEnv.SYSTEM_TEST_BASE_DIR + "/" + tcCfg["consumer.config"], templateLinesDict),
+                        migrationConsumerCfgPathName,
+                        {"zk.connect" : testcaseEnv.userDefinedEnvVarDict["sourceZkConnectStr"]}, None)
+
+                    # start_migration_tool expects these pathnames relative to system_test
+                    tcCfg["producer.config"] = os.path.relpath(migrationProducerCfgPathName, systemTestEnv.SYSTEM_TEST_BASE_DIR)
+                    tcCfg["consumer.config"] = os.path.relpath(migrationConsumerCfgPathName, systemTestEnv.SYSTEM_TEST_BASE_DIR)
+
                 else:
                     logger.debug("UNHANDLED role " + clusterCfg["role"], extra=d)
 
@@ -445,7 +564,7 @@ def scp_file_to_remote_host(clusterEntityConfigDictList, testcaseEnv):
         hostname         = clusterEntityConfigDict["hostname"]
         testcasePathName = testcaseEnv.testCaseBaseDir
 
-        cmdStr = "scp " + testcasePathName + "/config/* " + hostname + ":" + testcasePathName + "/config"
+        cmdStr = system_test_utils.SCP_CMD + " " + testcasePathName + "/config/* " + hostname + ":" + testcasePathName + "/config"
         logger.debug("executing command [" + cmdStr + "]", extra=d)
         system_test_utils.sys_call(cmdStr)
 
@@ -456,38 +575,115 @@ def start_zookeepers(systemTestEnv, testcaseEnv):
     zkEntityIdList = system_test_utils.get_data_from_list_of_dicts( 
         clusterEntityConfigDictList, "role", "zookeeper", "entity_id")
 
+    # start the zookeepers concurrently
+    argsList = []
     for zkEntityId in zkEntityIdList:
-        configPathName = get_testcase_config_log_dir_pathname(testcaseEnv, "zookeeper", zkEntityId, "config")
-        configFile     = system_test_utils.get_data_by_lookup_keyval(
-                             testcaseEnv.testcaseConfigsList, "entity_id", zkEntityId, "config_filename")
-        clientPort     = system_test_utils.get_data_by_lookup_keyval(
-                             testcaseEnv.testcaseConfigsList, "entity_id", zkEntityId, "clientPort")
-        dataDir        = system_test_utils.get_data_by_lookup_keyval(
-                             testcaseEnv.testcaseConfigsList, "entity_id", zkEntityId, "dataDir")
-        hostname       = system_test_utils.get_data_by_lookup_keyval(
-                             clusterEntityConfigDictList, "entity_id", zkEntityId, "hostname")
-        minusOnePort   = str(int(clientPort) - 1)
-        plusOnePort    = str(int(clientPort) + 1)
-
-        # read configFile to find out the id of the zk and create the file "myid"
-        infile  = open(configPathName + "/" + configFile, "r")
-        inlines = infile.readlines()
-        infile.close()
+        argsList.append((systemTestEnv, testcaseEnv, zkEntityId))
 
-        for line in inlines:
-            if line.startswith("server.") and hostname + ":" + minusOnePort + ":" + plusOnePort in line:
-                # server.1=host1:2187:2189
-                matchObj    = re.match("server\.(.*?)=.*", line)
-                zkServerId  = matchObj.group(1)
+    system_test_utils.run_in_parallel(start_zookeeper, argsList)
 
-        cmdStr = "ssh " + hostname + " 'mkdir -p " + dataDir + "; echo " + zkServerId + " > " + dataDir + "/myid'"
-        logger.debug("executing command [" + cmdStr + "]", extra=d)
-        subproc = system_test_utils.sys_call_return_subproc(cmdStr)
-        for line in subproc.stdout.readlines():
-            pass    # dummy loop to wait until producer is completed
+def start_zookeeper(systemTestEnv, testcaseEnv, zkEntityId):
+    clusterEntityConfigDictList = systemTestEnv.clusterEntityConfigDictList
+
+    configPathName = get_testcase_config_log_dir_pathname(testcaseEnv, "zookeeper", zkEntityId, "config")
+    configFile     = system_test_utils.get_data_by_lookup_keyval(
+                         testcaseEnv.testcaseConfigsList, "entity_id", zkEntityId, "config_filename")
+    clientPort     = system_test_utils.get_data_by_lookup_keyval(
+                         testcaseEnv.testcaseConfigsList, "entity_id", zkEntityId, "clientPort")
+    dataDir        = system_test_utils.get_data_by_lookup_keyval(
+                         testcaseEnv.testcaseConfigsList, "entity_id", zkEntityId, "dataDir")
+    hostname       = system_test_utils.get_data_by_lookup_keyval(
+                         clusterEntityConfigDictList, "entity_id", zkEntityId, "hostname")
+    minusOnePort   = str(int(clientPort) - 1)
+    plusOnePort    = str(int(clientPort) + 1)
+
+    # read configFile to find out the id of the zk and create the file "myid"
+    infile  = open(configPathName + "/" + configFile, "r")
+    inlines = infile.readlines()
+    infile.close()
+
+    for line in inlines:
+        if line.startswith("server.") and hostname + ":" + minusOnePort + ":" + plusOnePort in line:
+            # server.1=host1:2187:2189
+            matchObj    = re.match("server\.(.*?)=.*", line)
+            zkServerId  = matchObj.group(1)
+
+    cmdStr = system_test_utils.SSH_CMD + " " + hostname + " 'mkdir -p " + dataDir + "; echo " + zkServerId + " > " + dataDir + "/myid'"
+    logger.debug("executing command [" + cmdStr + "]", extra=d)
+    subproc = system_test_utils.sys_call_return_subproc(cmdStr)
+    for line in subproc.stdout.readlines():
+        pass    # dummy loop to wait until producer is completed
+
+    time.sleep(2)
+    start_entity_in_background(systemTestEnv, testcaseEnv, zkEntityId)
+
+def zookeeper_is_ok(hostname, clientPort):
+    # zookeeper replies "imok" to the four letter word "ruok" once it is serving
+    try:
+        sock = socket.create_connection((hostname, int(clientPort)), 1)
+        try:
+            sock.sendall("ruok")
+            return sock.recv(4) == "imok"
+        finally:
+            sock.close()
+    except socket.error:
+        return False
+
+def wait_for_zookeepers_ready(systemTestEnv, testcaseEnv, timeoutSec):
+    clusterEntityConfigDictList = systemTestEnv.clusterEntityConfigDictList
+
+    zkEntityIdList = system_test_utils.get_data_from_list_of_dicts(
+        clusterEntityConfigDictList, "role", "zookeeper", "entity_id")
+
+    for zkEntityId in zkEntityIdList:
+        hostname   = system_test_utils.get_data_by_lookup_keyval(
+                         clusterEntityConfigDictList, "entity_id", zkEntityId, "hostname")
+        clientPort = system_test_utils.get_data_by_lookup_keyval(
+                         testcaseEnv.testcaseConfigsList, "entity_id", zkEntityId, "clientPort")
+        logFile    = system_test_utils.get_data_by_lookup_keyval(
+                         testcaseEnv.testcaseConfigsList, "entity_id", zkEntityId, "log_filename")
+        logPathName = get_testcase_config_log_dir_pathname(testcaseEnv, "zookeeper", zkEntityId, "default") + "/" + logFile
+
+        logger.info("waiting for zookeeper [" + hostname + ":" + clientPort + "] to be ready", extra=d)
+        if not system_test_utils.wait_until(lambda: zookeeper_is_ok(hostname, clientPort), timeoutSec):
+            if remote_log_line_found(hostname, logPathName, PORT_IN_USE_PATTERN):
+                raise PortInUse("zookeeper [" + hostname + ":" + clientPort + "] failed to bind its port")
+            raise ZkConnectTimeout("zookeeper [" + hostname + ":" + clientPort + "] not ready in " + str(timeoutSec) + " sec")
+
+# logged by java.net.BindException when a port is taken
+PORT_IN_USE_PATTERN = "address already in use"
+
+def remote_log_line_found(hostname, logPathName, pattern):
+    cmdStr = system_test_utils.SSH_CMD + " " + hostname + " \"grep -i -c '" + pattern + "' " + logPathName + "\" 2> /dev/null"
+    logger.debug("executing command: [" + cmdStr + "]", extra=d)
+    subproc = system_test_utils.sys_call_return_subproc(cmdStr)
+
+    for line in subproc.stdout.readlines():
+        line = line.rstrip('\n')
+        if line.isdigit() and int(line) > 0:
+            return True
+    return False
+
+def wait_for_brokers_ready(systemTestEnv, testcaseEnv, timeoutSec):
+    clusterEntityConfigDictList = systemTestEnv.clusterEntityConfigDictList
 
-        time.sleep(2)
-        start_entity_in_background(systemTestEnv, testcaseEnv, zkEntityId)
+    brokerEntityIdList = system_test_utils.get_data_from_list_of_dicts(
+        clusterEntityConfigDictList, "role", "broker", "entity_id")
+
+    for brokerEntityId in brokerEntityIdList:
+        hostname    = system_test_utils.get_data_by_lookup_keyval(
+                          clusterEntityConfigDictList, "entity_id", brokerEntityId, "hostname")
+        logFile     = system_test_utils.get_data_by_lookup_keyval(
+                          testcaseEnv.testcaseConfigsList, "entity_id", brokerEntityId, "log_filename")
+        logPathName = get_testcase_config_log_dir_pathname(testcaseEnv, "broker", brokerEntityId, "default") + "/" + logFile
+
+        # 0.8 logs "[Kafka Server 1], started" and 0.7 logs "Kafka server started."
+        logger.info("waiting for broker [" + brokerEntityId + "] to be started", extra=d)
+        if not system_test_utils.wait_until(
+                lambda: remote_log_line_found(hostname, logPathName, "kafka server.*started"), timeoutSec):
+            if remote_log_line_found(hostname, logPathName, PORT_IN_USE_PATTERN):
+                raise PortInUse("broker [" + brokerEntityId + "] failed to bind its port")
+            raise BrokerStartupTimeout("broker [" + brokerEntityId + "] not started in " + str(timeoutSec) + " sec")
 
 def start_brokers(systemTestEnv, testcaseEnv):
     clusterEntityConfigDictList = systemTestEnv.clusterEntityConfigDictList
@@ -495,8 +691,12 @@ def start_brokers(systemTestEnv, testcaseEnv):
     brokerEntityIdList = system_test_utils.get_data_from_list_of_dicts( 
         clusterEntityConfigDictList, "role", "broker", "entity_id")
 
+    # start the brokers concurrently
+    argsList = []
     for brokerEntityId in brokerEntityIdList:
-        start_entity_in_background(systemTestEnv, testcaseEnv, brokerEntityId)
+        argsList.append((systemTestEnv, testcaseEnv, brokerEntityId))
+
+    system_test_utils.run_in_parallel(start_entity_in_background, argsList)
 
 
 def start_mirror_makers(systemTestEnv, testcaseEnv, onlyThisEntityId=None):
@@ -532,7 +732,7 @@ def get_broker_shutdown_log_line(systemTestEnv, testcaseEnv, leaderAttributesDic
                          testcaseEnv.testcaseConfigsList, "entity_id", brokerEntityId, "log_filename")
 
         logPathName = get_testcase_config_log_dir_pathname(testcaseEnv, "broker", brokerEntityId, "default")
-        cmdStrList = ["ssh " + hostname,
+        cmdStrList = [system_test_utils.SSH_CMD + " " + hostname,
                       "\"grep -i -h '" + leaderAttributesDict["BROKER_SHUT_DOWN_COMPLETED_MSG"] + "' ",
                       logPathName + "/" + logFile + " | ",
                       "sort | tail -1\""]
@@ -590,7 +790,7 @@ def get_leader_elected_log_line(systemTestEnv, testcaseEnv, leaderAttributesDict
                          testcaseEnv.testcaseConfigsList, "entity_id", brokerEntityId, "log_filename")
 
         logPathName = get_testcase_config_log_dir_pathname(testcaseEnv, "broker", brokerEntityId, "default")
-        cmdStrList = ["ssh " + hostname,
+        cmdStrList = [system_test_utils.SSH_CMD + " " + hostname,
                       "\"grep -i -h '" + leaderAttributesDict["LEADER_ELECTION_COMPLETED_MSG"] + "' ",
                       logPathName + "/" + logFile + " | ",
                       "sort | tail -1\""]
@@ -660,7 +860,7 @@ def start_entity_in_background(systemTestEnv, testcaseEnv, entityId):
     logPathName    = get_testcase_config_log_dir_pathname(testcaseEnv, role, entityId, "default")
 
     if role == "zookeeper":
-        cmdList = ["ssh " + hostname,
+        cmdList = [system_test_utils.SSH_CMD + " " + hostname,
                   "'JAVA_HOME=" + javaHome,
                   "JMX_PORT=" + jmxPort,
                   kafkaHome + "/bin/zookeeper-server-start.sh ",
@@ -669,23 +869,23 @@ def start_entity_in_background(systemTestEnv, testcaseEnv, entityId):
                   logPathName + "/entity_" + entityId + "_pid'"]
 
     elif role == "broker":
-        cmdList = ["ssh " + hostname,
+        cmdList = [system_test_utils.SSH_CMD + " " + hostname,
                   "'JAVA_HOME=" + javaHome,
                  "JMX_PORT=" + jmxPort,
                   kafkaHome + "/bin/kafka-run-class.sh kafka.Kafka",
                   configPathName + "/" + configFile + " >> ",
-                  logPathName + "/" + logFile + " & echo pid:$! > ",
+                  logPathName + "/" + logFile + " 2>&1 & echo pid:$! > ",
                   logPathName + "/entity_" + entityId + "_pid'"]
 
     elif role == "mirror_maker":
-        cmdList = ["ssh " + hostname,
+        cmdList = [system_test_utils.SSH_CMD + " " + hostname,
                   "'JAVA_HOME=" + javaHome,
                  "JMX_PORT=" + jmxPort,
                   kafkaHome + "/bin/kafka-run-class.sh kafka.tools.MirrorMaker",
                   "--consumer.config " + configPathName + "/" + mmConsumerConfigFile,
                   "--producer.config " + configPathName + "/" + mmProducerConfigFile,
                   "--whitelist=\".*\" >> ",
-                  logPathName + "/" + logFile + " & echo pid:$! > ",
+                  logPathName + "/" + logFile + " 2>&1 & echo pid:$! > ",
                   logPathName + "/entity_" + entityId + "_pid'"]
 
     cmdStr = " ".join(cmdList)
@@ -694,7 +894,7 @@ def start_entity_in_background(systemTestEnv, testcaseEnv, entityId):
     system_test_utils.async_sys_call(cmdStr)
     time.sleep(5)
 
-    pidCmdStr = "ssh " + hostname + " 'cat " + logPathName + "/entity_" + entityId + "_pid' 2> /dev/null"
+    pidCmdStr = system_test_utils.SSH_CMD + " " + hostname + " 'cat " + logPathName + "/entity_" + entityId + "_pid' 2> /dev/null"
     logger.debug("executing command: [" + pidCmdStr + "]", extra=d)
     subproc = system_test_utils.sys_call_return_subproc(pidCmdStr)
 
@@ -760,7 +960,13 @@ def start_console_consumer(systemTestEnv, testcaseEnv):
             logger.error("Invalid cluster name : " + clusterName, extra=d)
             sys.exit(1)
 
-        cmdList = ["ssh " + host,
+        # the pid file and pid of a previous testcase must not be mistaken
+        # for the ones of this consumer
+        consumerPidPathName = consumerLogPath + "/entity_" + entityId + "_pid"
+        testcaseEnv.consumerHostParentPidDict.pop(host, None)
+        system_test_utils.sys_call(system_test_utils.SSH_CMD + " " + host + " 'rm -f " + consumerPidPathName + "'")
+
+        cmdList = [system_test_utils.SSH_CMD + " " + host,
                    "'JAVA_HOME=" + javaHome,
                    "JMX_PORT=" + jmxPort,
                    kafkaRunClassBin + " kafka.consumer.ConsoleConsumer",
@@ -772,24 +978,35 @@ def start_console_consumer(systemTestEnv, testcaseEnv):
                    formatterOption,
                    "--from-beginning ",
                    " >> " + consumerLogPathName,
-                   " & echo pid:$! > " + consumerLogPath + "/entity_" + entityId + "_pid'"]
+                   " 2>> " + consumerLogPath + "/console_consumer_stderr.log",
+                   " & echo pid:$! > " + consumerPidPathName + "'"]
 
         cmdStr = " ".join(cmdList)
 
         logger.debug("executing command: [" + cmdStr + "]", extra=d)
         system_test_utils.async_sys_call(cmdStr)
 
-        pidCmdStr = "ssh " + host + " 'cat " + consumerLogPath + "/entity_" + entityId + "_pid'"
-        logger.debug("executing command: [" + pidCmdStr + "]", extra=d)
-        subproc = system_test_utils.sys_call_return_subproc(pidCmdStr)
+        # keep track of the remote entity pid in a dictionary once the
+        # asynchronous command has written the pid file
+        if system_test_utils.wait_until(lambda: get_remote_entity_pid(host, consumerPidPathName) is not None, 10):
+            testcaseEnv.consumerHostParentPidDict[host] = get_remote_entity_pid(host, consumerPidPathName)
+        else:
+            logger.warn("pid of console consumer in host [" + host + "] not found", extra=d)
 
-        # keep track of the remote entity pid in a dictionary
-        for line in subproc.stdout.readlines():
-            if line.startswith("pid"):
-                line = line.rstrip('\n')
-                logger.debug("found pid line: [" + line + "]", extra=d)
-                tokens = line.split(':')
-                testcaseEnv.consumerHostParentPidDict[host] = tokens[1]
+def get_remote_entity_pid(hostname, pidPathName):
+    # returns the pid in a remote "pid:<n>" file or None if it is not written yet
+    pidCmdStr = system_test_utils.SSH_CMD + " " + hostname + " 'cat " + pidPathName + " 2> /dev/null'"
+    logger.debug("executing command: [" + pidCmdStr + "]", extra=d)
+    subproc = system_test_utils.sys_call_return_subproc(pidCmdStr)
+
+    for line in subproc.stdout.readlines():
+        if line.startswith("pid"):
+            line = line.rstrip('\n')
+            logger.debug("found pid line: [" + line + "]", extra=d)
+            pid = line.split(':')[1].strip()
+            if pid.isdigit():
+                return pid
+    return None
 
 def start_producer_performance(systemTestEnv, testcaseEnv, kafka07Client):
 
@@ -883,7 +1100,7 @@ def start_producer_in_thread(testcaseEnv, entityConfigList, producerConfig, kafk
             logger.info("#### [producer thread] status of stopBackgroundProducer : [False] => producing [" \
                 + str(noMsgPerBatch) + "] messages with starting message id : [" + str(initMsgId) + "]", extra=d)
 
-            cmdList = ["ssh " + host,
+            cmdList = [system_test_utils.SSH_CMD + " " + host,
                        "'JAVA_HOME=" + javaHome,
                        "JMX_PORT=" + jmxPort,
                        kafkaRunClassBin + " kafka.perf.ProducerPerformance",
@@ -918,7 +1135,7 @@ def start_producer_in_thread(testcaseEnv, entityConfigList, producerConfig, kafk
 
                 brokerInfoStr = "broker.list=" + brokerInfoStr
 
-                cmdList = ["ssh " + host,
+                cmdList = [system_test_utils.SSH_CMD + " " + host,
                        "'JAVA_HOME=" + javaHome,
                        "JMX_PORT=" + jmxPort,
                        kafkaRunClassBin + " kafka.perf.ProducerPerformance",
@@ -956,6 +1173,7 @@ def start_producer_in_thread(testcaseEnv, entityConfigList, producerConfig, kafk
         time.sleep(1)
         if testcaseEnv.numProducerThreadsRunning == 0:
             testcaseEnv.userDefinedEnvVarDict["backgroundProducerStopped"] = True
+            testcaseEnv.backgroundProducerStoppedEvent.set()
             testcaseEnv.lock.release()
             break
         else:
@@ -963,8 +1181,10 @@ def start_producer_in_thread(testcaseEnv, entityConfigList, producerConfig, kafk
             testcaseEnv.lock.release()
         time.sleep(1)
 
-def stop_remote_entity(systemTestEnv, entityId, parentPid, signalType="SIGTERM"):
-    clusterEntityConfigDictList = systemTestEnv.clusterEntityConfigDictList
+def stop_remote_entity(systemTestEnv, entityId, parentPid, signalType="SIGTERM", clusterEntityConfigDictList=None):
+    # clusterEntityConfigDictList overrides the cluster config of the current testcase
+    if clusterEntityConfigDictList is None:
+        clusterEntityConfigDictList = systemTestEnv.clusterEntityConfigDictList
 
     hostname  = system_test_utils.get_data_by_lookup_keyval(clusterEntityConfigDictList, "entity_id", entityId, "hostname")
     pidStack  = system_test_utils.get_remote_child_processes(hostname, parentPid)
@@ -1018,7 +1238,7 @@ def create_topic(systemTestEnv, testcaseEnv):
 
         for topic in topicsList:
             logger.info("creating topic: [" + topic + "] at: [" + zkConnectStr + "]", extra=d) 
-            cmdList = ["ssh " + zkHost,
+            cmdList = [system_test_utils.SSH_CMD + " " + zkHost,
                        "'JAVA_HOME=" + javaHome,
                        createTopicBin,
                        " --topic "     + topic,
@@ -1030,6 +1250,8 @@ def create_topic(systemTestEnv, testcaseEnv):
             cmdStr = " ".join(cmdList)
             logger.debug("executing command: [" + cmdStr + "]", extra=d)
             subproc = system_test_utils.sys_call_return_subproc(cmdStr)
+            for line in subproc.stdout.readlines():
+                pass    # dummy loop to wait until topic is created
 
 
 def get_message_id(logPathName, topic=""):
@@ -1067,6 +1289,21 @@ def get_message_checksum(logPathName):
     return messageChecksumList
 
 
+def get_message_checksum_summary(logPathName):
+    # returns (no. of msgs, no. of unique msgs, md5 of the unique msg checksums)
+    # as computed on the remote host, or None if the summary is not available
+    summaryPathName = logPathName + MSG_CHECKSUM_SUMMARY_SUFFIX
+    if not os.path.isfile(summaryPathName):
+        return None
+
+    tokens = open(summaryPathName, "r").read().split()
+    if len(tokens) != 3:
+        logger.warn("unexpected message checksum summary in " + summaryPathName, extra=d)
+        return None
+
+    return (int(tokens[0]), int(tokens[1]), tokens[2])
+
+
 def validate_data_matched(systemTestEnv, testcaseEnv):
     validationStatusDict        = testcaseEnv.validationStatusDict
     clusterEntityConfigDictList = systemTestEnv.clusterEntityConfigDictList
@@ -1155,69 +1392,106 @@ def validate_leader_election_successful(testcaseEnv, leaderDict, validationStatu
         return False
 
 
-def cleanup_data_at_remote_hosts(systemTestEnv, testcaseEnv):
-
-    clusterEntityConfigDictList = systemTestEnv.clusterEntityConfigDictList
-    testcaseConfigsList         = testcaseEnv.testcaseConfigsList
+def cleanup_data_at_remote_hosts(systemTestEnv, testcaseEnv, cleanupDataDirs=True):
+    # cleanupDataDirs=False only cleans up the logs of this testcase and leaves
+    # the data dirs of a running zookeeper / broker cluster intact
 
+    argsList = []
     for clusterEntityConfigDict in systemTestEnv.clusterEntityConfigDictList:
+        argsList.append((clusterEntityConfigDict, testcaseEnv, cleanupDataDirs))
 
-        hostname         = clusterEntityConfigDict["hostname"]
-        entityId         = clusterEntityConfigDict["entity_id"]
-        role             = clusterEntityConfigDict["role"]
-        kafkaHome        = clusterEntityConfigDict["kafka_home"]
-        testCaseBaseDir  = testcaseEnv.testCaseBaseDir
-        cmdStr           = ""
-        dataDir          = ""
-
-        logger.info("cleaning up data dir on host: [" + hostname + "]", extra=d)
-
-        if role == 'zookeeper':
-            dataDir = system_test_utils.get_data_by_lookup_keyval(testcaseConfigsList, "entity_id", entityId, "dataDir")
-        elif role == 'broker':
-            dataDir = system_test_utils.get_data_by_lookup_keyval(testcaseConfigsList, "entity_id", entityId, "log.dir")
-        else:
-            logger.info("skipping role [" + role + "] on host : [" + hostname + "]", extra=d)
-            continue
+    # clean up all entities concurrently
+    system_test_utils.run_in_parallel(cleanup_entity_data_at_remote_host, argsList)
 
-        cmdStr  = "ssh " + hostname + " 'rm -rf " + dataDir + "'"
+def cleanup_entity_data_at_remote_host(clusterEntityConfigDict, testcaseEnv, cleanupDataDirs):
+    testcaseConfigsList = testcaseEnv.testcaseConfigsList
 
-        if not dataDir.startswith("/tmp"):
-            logger.warn("possible destructive command [" + cmdStr + "]", extra=d)
-            logger.warn("check config file: system_test/cluster_config.properties", extra=d)
-            logger.warn("aborting test...", extra=d)
-            sys.exit(1)
+    hostname         = clusterEntityConfigDict["hostname"]
+    entityId         = clusterEntityConfigDict["entity_id"]
+    role             = clusterEntityConfigDict["role"]
+    kafkaHome        = clusterEntityConfigDict["kafka_home"]
+    testCaseBaseDir  = testcaseEnv.testCaseBaseDir
+    cmdStr           = ""
+    dataDir          = ""
+
+    logger.info("cleaning up data dir on host: [" + hostname + "]", extra=d)
+
+    if role == 'zookeeper':
+        dataDir = system_test_utils.get_data_by_lookup_keyval(testcaseConfigsList, "entity_id", entityId, "dataDir")
+    elif role == 'broker':
+        dataDir = system_test_utils.get_data_by_lookup_keyval(testcaseConfigsList, "entity_id", entityId, "log.dir")
+    else:
+        logger.info("skipping role [" + role + "] on host : [" + hostname + "]", extra=d)
+        return
+
+    cmdStr  = system_test_utils.SSH_CMD + " " + hostname + " 'rm -rf " + dataDir + "'"
 
-        # ============================
-        # cleaning data dir
-        # ============================
+    if not dataDir.startswith("/tmp"):
+        logger.warn("possible destructive command [" + cmdStr + "]", extra=d)
+        logger.warn("check config file: system_test/cluster_config.properties", extra=d)
+        logger.warn("aborting test...", extra=d)
+        sys.exit(1)
+
+    # ============================
+    # cleaning data dir
+    # ============================
+    if cleanupDataDirs:
         logger.debug("executing command [" + cmdStr + "]", extra=d)
         system_test_utils.sys_call(cmdStr)
 
-        # ============================
-        # cleaning log/metrics/svg, ...
-        # ============================
-        if system_test_utils.remote_host_file_exists(hostname, kafkaHome + "/bin/kafka-run-class.sh"):
-            # so kafkaHome is a real kafka installation
-            cmdStr = "ssh " + hostname + " \"find " + testCaseBaseDir + " -name '*.log' | xargs rm 2> /dev/null\""
-            logger.debug("executing command [" + cmdStr + "]", extra=d)
-            system_test_utils.sys_call(cmdStr)
+    # ============================
+    # cleaning log/metrics/svg, ...
+    # ============================
+    if system_test_utils.remote_host_file_exists(hostname, kafkaHome + "/bin/kafka-run-class.sh"):
+        # so kafkaHome is a real kafka installation
+        cmdStr = system_test_utils.SSH_CMD + " " + hostname + " \"find " + testCaseBaseDir + " -name '*.log' | xargs rm 2> /dev/null\""
+        logger.debug("executing command [" + cmdStr + "]", extra=d)
+        system_test_utils.sys_call(cmdStr)
 
-            cmdStr = "ssh " + hostname + " \"find " + testCaseBaseDir + " -name '*_pid' | xargs rm 2> /dev/null\""
-            logger.debug("executing command [" + cmdStr + "]", extra=d)
-            system_test_utils.sys_call(cmdStr)
+        cmdStr = system_test_utils.SSH_CMD + " " + hostname + " \"find " + testCaseBaseDir + " -name '*_pid' | xargs rm 2> /dev/null\""
+        logger.debug("executing command [" + cmdStr + "]", extra=d)
+        system_test_utils.sys_call(cmdStr)
 
-            cmdStr = "ssh " + hostname + " \"find " + testCaseBaseDir + " -name '*.csv' | xargs rm 2> /dev/null\""
-            logger.debug("executing command [" + cmdStr + "]", extra=d)
-            system_test_utils.sys_call(cmdStr)
+        cmdStr = system_test_utils.SSH_CMD + " " + hostname + " \"find " + testCaseBaseDir + " -name '*.csv' | xargs rm 2> /dev/null\""
+        logger.debug("executing command [" + cmdStr + "]", extra=d)
+        system_test_utils.sys_call(cmdStr)
 
-            cmdStr = "ssh " + hostname + " \"find " + testCaseBaseDir + " -name '*.svg' | xargs rm 2> /dev/null\""
-            logger.debug("executing command [" + cmdStr + "]", extra=d)
-            system_test_utils.sys_call(cmdStr)
+        cmdStr = system_test_utils.SSH_CMD + " " + hostname + " \"find " + testCaseBaseDir + " -name '*.svg' | xargs rm 2> /dev/null\""
+        logger.debug("executing command [" + cmdStr + "]", extra=d)
+        system_test_utils.sys_call(cmdStr)
 
-            cmdStr = "ssh " + hostname + " \"find " + testCaseBaseDir + " -name '*.html' | xargs rm 2> /dev/null\""
-            logger.debug("executing command [" + cmdStr + "]", extra=d)
-            system_test_utils.sys_call(cmdStr)
+        cmdStr = system_test_utils.SSH_CMD + " " + hostname + " \"find " + testCaseBaseDir + " -name '*.html' | xargs rm 2> /dev/null\""
+        logger.debug("executing command [" + cmdStr + "]", extra=d)
+        system_test_utils.sys_call(cmdStr)
+
+        cmdStr = system_test_utils.SSH_CMD + " " + hostname + " \"find " + testCaseBaseDir + " -name '*" + MSG_CHECKSUM_SUMMARY_SUFFIX + "' | xargs rm 2> /dev/null\""
+        logger.debug("executing command [" + cmdStr + "]", extra=d)
+        system_test_utils.sys_call(cmdStr)
+
+        cmdStr = system_test_utils.SSH_CMD + " " + hostname + " \"find " + testCaseBaseDir + " -name '" + LOG_SEGMENT_CHECKSUMS_FILENAME + "' | xargs rm 2> /dev/null\""
+        logger.debug("executing command [" + cmdStr + "]", extra=d)
+        system_test_utils.sys_call(cmdStr)
+
+def get_zk_broker_cluster_signature(systemTestEnv, testcaseEnv):
+    # the cluster level and testcase level settings of all zookeeper and
+    # broker entities. Testcases with the same signature can be run on the
+    # same running zookeeper / broker cluster
+    signatureList = []
+    for clusterEntityConfigDict in systemTestEnv.clusterEntityConfigDictList:
+        if clusterEntityConfigDict["role"] in ["zookeeper", "broker"]:
+            entityId = clusterEntityConfigDict["entity_id"]
+            signatureList.append([clusterEntityConfigDict, system_test_utils.get_dict_from_list_of_dicts(
+                                  testcaseEnv.testcaseConfigsList, "entity_id", entityId)])
+
+    return json.dumps(signatureList, sort_keys=True)
+
+def add_testcase_suffix_to_topics(testcaseEnv, testcaseDirName):
+    # topics in a shared cluster are isolated by suffixing them with the testcase name:
+    # test_1 => test_1_testcase_9001
+    for tcCfg in testcaseEnv.testcaseConfigsList:
+        if "topic" in tcCfg:
+            topicsList = tcCfg["topic"].split(',')
+            tcCfg["topic"] = ",".join([topic + "_" + testcaseDirName for topic in topicsList])
 
 def get_entity_log_directory(testCaseBaseDir, entity_id, role):
     return testCaseBaseDir + "/logs/" + role + "-" + entity_id
@@ -1228,13 +1502,14 @@ def get_entities_for_role(clusterConfig, role):
 def stop_consumer():
     system_test_utils.sys_call("ps -ef | grep ConsoleConsumer | grep -v grep | tr -s ' ' | cut -f2 -d' ' | xargs kill -15")
 
-def ps_grep_terminate_running_entity(systemTestEnv):
-    clusterEntityConfigDictList = systemTestEnv.clusterEntityConfigDictList
+def ps_grep_terminate_running_entity(systemTestEnv, clusterEntityConfigDictList=None):
+    if clusterEntityConfigDictList is None:
+        clusterEntityConfigDictList = systemTestEnv.clusterEntityConfigDictList
     username = getpass.getuser()
 
-    for clusterEntityConfigDict in systemTestEnv.clusterEntityConfigDictList:
+    for clusterEntityConfigDict in clusterEntityConfigDictList:
         hostname = clusterEntityConfigDict["hostname"]
-        cmdList  = ["ssh " + hostname,
+        cmdList  = [system_test_utils.SSH_CMD + " " + hostname,
                     "\"ps auxw | grep -v grep | grep -v Bootstrap | grep -v vim | grep ^" + username,
                     "| grep -i 'java\|server\-start\|run\-\|producer\|consumer\|jmxtool' | grep kafka",
                     "| tr -s ' ' | cut -f2 -d ' ' | xargs kill -9" + "\""]
@@ -1303,30 +1578,50 @@ def get_reelection_latency(systemTestEnv, testcaseEnv, leaderDict, leaderAttribu
     return leaderReElectionLatency
 
 
-def stop_all_remote_running_processes(systemTestEnv, testcaseEnv):
+def stop_all_remote_running_processes(systemTestEnv, testcaseEnv, includeZkAndBrokers=True):
+    # includeZkAndBrokers=False leaves a shared zookeeper / broker cluster running
 
     entityConfigs = systemTestEnv.clusterEntityConfigDictList
 
+    # the entities are stopped concurrently in 3 stages:
+    # 1. clients (producer, consumer, jmx, mirror maker, migration tool)
+    # 2. brokers
+    # 3. zookeepers
+    argsList = []
     for hostname, producerPPid in testcaseEnv.producerHostParentPidDict.items():
         producerEntityId = system_test_utils.get_data_by_lookup_keyval(entityConfigs, "hostname", hostname, "entity_id")
-        stop_remote_entity(systemTestEnv, producerEntityId, producerPPid)
+        argsList.append((systemTestEnv, producerEntityId, producerPPid))
 
     for hostname, consumerPPid in testcaseEnv.consumerHostParentPidDict.items():
         consumerEntityId = system_test_utils.get_data_by_lookup_keyval(entityConfigs, "hostname", hostname, "entity_id")
-        stop_remote_entity(systemTestEnv, consumerEntityId, consumerPPid)
+        argsList.append((systemTestEnv, consumerEntityId, consumerPPid))
 
     for entityId, jmxParentPidList in testcaseEnv.entityJmxParentPidDict.items():
         for jmxParentPid in jmxParentPidList:
-            stop_remote_entity(systemTestEnv, entityId, jmxParentPid)
+            argsList.append((systemTestEnv, entityId, jmxParentPid))
 
     for entityId, mirrorMakerParentPid in testcaseEnv.entityMirrorMakerParentPidDict.items():
-        stop_remote_entity(systemTestEnv, entityId, mirrorMakerParentPid)
+        argsList.append((systemTestEnv, entityId, mirrorMakerParentPid))
+
+    for entityId, migrationToolParentPid in testcaseEnv.entityMigrationToolParentPidDict.items():
+        argsList.append((systemTestEnv, entityId, migrationToolParentPid))
+
+    system_test_utils.run_in_parallel(stop_remote_entity, argsList)
+
+    if not includeZkAndBrokers:
+        return
+
+    stop_remote_entities(systemTestEnv, testcaseEnv.entityBrokerParentPidDict)
+    stop_remote_entities(systemTestEnv, testcaseEnv.entityZkParentPidDict)
 
-    for entityId, brokerParentPid in testcaseEnv.entityBrokerParentPidDict.items():
-        stop_remote_entity(systemTestEnv, entityId, brokerParentPid)
 
-    for entityId, zkParentPid in testcaseEnv.entityZkParentPidDict.items():
-        stop_remote_entity(systemTestEnv, entityId, zkParentPid)
+def stop_remote_entities(systemTestEnv, entityParentPidDict, clusterEntityConfigDictList=None):
+    # stop all entities in a dict of entity_id to ppid concurrently
+    argsList = []
+    for entityId, parentPid in entityParentPidDict.items():
+        argsList.append((systemTestEnv, entityId, parentPid, "SIGTERM", clusterEntityConfigDictList))
+
+    system_test_utils.run_in_parallel(stop_remote_entity, argsList)
 
 
 def start_migration_tool(systemTestEnv, testcaseEnv, onlyThisEntityId=None):
@@ -1362,7 +1657,7 @@ def start_migration_tool(systemTestEnv, testcaseEnv, onlyThisEntityId=None):
             whiteList       = system_test_utils.get_data_by_lookup_keyval(testcaseConfigsList, "entity_id", entityId, "whitelist")
             logFile         = system_test_utils.get_data_by_lookup_keyval(testcaseConfigsList, "entity_id", entityId, "log_filename")
 
-            cmdList = ["ssh " + host,
+            cmdList = [system_test_utils.SSH_CMD + " " + host,
                        "'JAVA_HOME=" + javaHome,
                        "JMX_PORT=" + jmxPort,
                        kafkaRunClassBin + " kafka.tools.KafkaMigrationTool",
@@ -1381,7 +1676,7 @@ def start_migration_tool(systemTestEnv, testcaseEnv, onlyThisEntityId=None):
             system_test_utils.async_sys_call(cmdStr)
             time.sleep(5)
 
-            pidCmdStr = "ssh " + host + " 'cat " + migrationToolLogPath + "/entity_" + entityId + "_pid' 2> /dev/null"
+            pidCmdStr = system_test_utils.SSH_CMD + " " + host + " 'cat " + migrationToolLogPath + "/entity_" + entityId + "_pid' 2> /dev/null"
             logger.debug("executing command: [" + pidCmdStr + "]", extra=d)
             subproc = system_test_utils.sys_call_return_subproc(pidCmdStr)
 
@@ -1394,6 +1689,77 @@ def start_migration_tool(systemTestEnv, testcaseEnv, onlyThisEntityId=None):
                     testcaseEnv.entityMigrationToolParentPidDict[entityId] = tokens[1]
 
 
+def wait_for_migration_tool_ready(systemTestEnv, testcaseEnv, timeoutSec, onlyThisEntityId=None):
+    # the migration tool is ready once its 0.7 consumer completed a rebalance.
+    # Returns False if any migration tool is not ready within timeoutSec
+    clusterConfigList = systemTestEnv.clusterEntityConfigDictList
+    migrationToolConfigList = system_test_utils.get_dict_from_list_of_dicts(clusterConfigList, "role", "migration_tool")
+
+    for migrationToolConfig in migrationToolConfigList:
+        entityId = migrationToolConfig["entity_id"]
+
+        if onlyThisEntityId is None or entityId == onlyThisEntityId:
+            hostname    = migrationToolConfig["hostname"]
+            logPathName = get_testcase_config_log_dir_pathname(testcaseEnv, "migration_tool", entityId, "default") \
+                          + "/migrationTool.log"
+
+            logger.info("waiting for migration tool [" + entityId + "] to be ready", extra=d)
+            if not system_test_utils.wait_until(
+                    lambda: remote_log_line_found(hostname, logPathName, "end rebalancing consumer"), timeoutSec):
+                return False
+    return True
+
+def get_remote_message_count(hostname, logPathName):
+    # no. of messages logged with a checksum by the producer / consumer so far
+    cmdStr = system_test_utils.SSH_CMD + " " + hostname + " \"grep -c 'checksum:' " + logPathName + "\" 2> /dev/null"
+    logger.debug("executing command: [" + cmdStr + "]", extra=d)
+    subproc = system_test_utils.sys_call_return_subproc(cmdStr)
+
+    for line in subproc.stdout.readlines():
+        line = line.rstrip('\n')
+        if line.isdigit():
+            return int(line)
+    return 0
+
+def wait_for_producer_progress(systemTestEnv, testcaseEnv, timeoutSec):
+    # wait until every producer has produced another batch of messages or timeoutSec is reached
+    clusterConfigList  = systemTestEnv.clusterEntityConfigDictList
+    producerConfigList = system_test_utils.get_dict_from_list_of_dicts(clusterConfigList, "role", "producer_performance")
+    deadline           = time.time() + timeoutSec
+
+    for producerConfig in producerConfigList:
+        hostname     = producerConfig["hostname"]
+        entityId     = producerConfig["entity_id"]
+        logPathName  = get_testcase_config_log_dir_pathname(testcaseEnv, "producer_performance", entityId, "default") \
+                       + "/producer_performance.log"
+        noMsgPerBatch = system_test_utils.get_data_by_lookup_keyval(testcaseEnv.testcaseConfigsList, "entity_id", entityId, "message")
+
+        targetCount = get_remote_message_count(hostname, logPathName) + int(noMsgPerBatch)
+        system_test_utils.wait_until(lambda: get_remote_message_count(hostname, logPathName) >= targetCount,
+                                     max(0, deadline - time.time()))
+
+def wait_for_console_consumers_stopped(systemTestEnv, testcaseEnv, timeoutSec, minWaitSec=20):
+    # the console consumers exit by themselves after "consumer-timeout-ms" without new messages.
+    # Without the pid of a consumer, wait for minWaitSec as the consumers can't be polled
+    startTime = time.time()
+    deadline  = startTime + timeoutSec
+
+    consumerConfigList = system_test_utils.get_dict_from_list_of_dicts(
+                             systemTestEnv.clusterEntityConfigDictList, "role", "console_consumer")
+    for consumerConfig in consumerConfigList:
+        host         = consumerConfig["hostname"]
+        consumerPPid = testcaseEnv.consumerHostParentPidDict.get(host)
+
+        if consumerPPid is None:
+            logger.warn("pid of console consumer in host [" + host + "] unknown => waiting for " + str(minWaitSec) + " sec", extra=d)
+            time.sleep(max(0, startTime + minWaitSec - time.time()))
+            continue
+
+        logger.info("waiting for console consumer in host [" + host + "] to complete", extra=d)
+        if not system_test_utils.wait_until(lambda: not system_test_utils.remote_process_is_running(host, consumerPPid),
+                                            max(0, deadline - time.time())):
+            logger.warn("console consumer in host [" + host + "] still running after " + str(timeoutSec) + " sec", extra=d)
+
 def validate_07_08_migrated_data_matched(systemTestEnv, testcaseEnv):
     validationStatusDict        = testcaseEnv.validationStatusDict
     clusterEntityConfigDictList = systemTestEnv.clusterEntityConfigDictList
@@ -1428,21 +1794,37 @@ def validate_07_08_migrated_data_matched(systemTestEnv, testcaseEnv):
         consumerLogPath     = get_testcase_config_log_dir_pathname(testcaseEnv, "console_consumer", matchingConsumerEntityId, "default")
         consumerLogPathName = consumerLogPath + "/console_consumer.log"
 
-        producerMsgChecksumList      = get_message_checksum(producerLogPathName)
-        consumerMsgChecksumList      = get_message_checksum(consumerLogPathName)
-        producerMsgChecksumSet       = set(producerMsgChecksumList)
-        consumerMsgChecksumSet       = set(consumerMsgChecksumList)
-        producerMsgChecksumUniqList  = list(producerMsgChecksumSet)
-        consumerMsgChecksumUniqList  = list(consumerMsgChecksumSet)
-
-        missingMsgChecksumInConsumer = producerMsgChecksumSet - consumerMsgChecksumSet
-
-        logger.debug("size of producerMsgChecksumList      : " + str(len(producerMsgChecksumList)), extra=d)
-        logger.debug("size of consumerMsgChecksumList      : " + str(len(consumerMsgChecksumList)), extra=d)
-        logger.debug("size of producerMsgChecksumSet       : " + str(len(producerMsgChecksumSet)), extra=d)
-        logger.debug("size of consumerMsgChecksumSet       : " + str(len(consumerMsgChecksumSet)), extra=d)
-        logger.debug("size of producerMsgChecksumUniqList  : " + str(len(producerMsgChecksumUniqList)), extra=d)
-        logger.debug("size of consumerMsgChecksumUniqList  : " + str(len(consumerMsgChecksumUniqList)), extra=d)
+        if not os.path.isfile(producerLogPathName) or not os.path.isfile(consumerLogPathName):
+            logger.error("producer log " + producerLogPathName + " or consumer log " + consumerLogPathName + " not found", extra=d)
+            validationStatusDict["Validate for data matched on topic [" + topic + "]"] = "FAILED"
+            continue
+
+        producerMsgChecksumSummary = get_message_checksum_summary(producerLogPathName)
+        consumerMsgChecksumSummary = get_message_checksum_summary(consumerLogPathName)
+
+        if producerMsgChecksumSummary is not None and consumerMsgChecksumSummary is not None \
+            and producerMsgChecksumSummary[2] == consumerMsgChecksumSummary[2]:
+            # the unique message checksums matched on the remote hosts => no need to read the logs
+            (producerMsgCount, producerUniqMsgCount, producerMd5) = producerMsgChecksumSummary
+            (consumerMsgCount, consumerUniqMsgCount, consumerMd5) = consumerMsgChecksumSummary
+            missingMsgChecksumInConsumer = set()
+        else:
+            producerMsgChecksumList      = get_message_checksum(producerLogPathName)
+            consumerMsgChecksumList      = get_message_checksum(consumerLogPathName)
+            producerMsgChecksumSet       = set(producerMsgChecksumList)
+            consumerMsgChecksumSet       = set(consumerMsgChecksumList)
+
+            missingMsgChecksumInConsumer = producerMsgChecksumSet - consumerMsgChecksumSet
+
+            producerMsgCount     = len(producerMsgChecksumList)
+            consumerMsgCount     = len(consumerMsgChecksumList)
+            producerUniqMsgCount = len(producerMsgChecksumSet)
+            consumerUniqMsgCount = len(consumerMsgChecksumSet)
+
+        logger.debug("size of producerMsgChecksumList      : " + str(producerMsgCount), extra=d)
+        logger.debug("size of consumerMsgChecksumList      : " + str(consumerMsgCount), extra=d)
+        logger.debug("size of producerMsgChecksumSet       : " + str(producerUniqMsgCount), extra=d)
+        logger.debug("size of consumerMsgChecksumSet       : " + str(consumerUniqMsgCount), extra=d)
         logger.debug("size of missingMsgChecksumInConsumer : " + str(len(missingMsgChecksumInConsumer)), extra=d)
 
         outfile = open(msgChecksumMissingInConsumerLogPathName, "w")
@@ -1450,14 +1832,14 @@ def validate_07_08_migrated_data_matched(systemTestEnv, testcaseEnv):
             outfile.write(id + "\n")
         outfile.close()
 
-        logger.info("no. of messages on topic [" + topic + "] sent from producer          : " + str(len(producerMsgChecksumList)), extra=d)
-        logger.info("no. of messages on topic [" + topic + "] received by consumer        : " + str(len(consumerMsgChecksumList)), extra=d)
-        logger.info("no. of unique messages on topic [" + topic + "] sent from producer   : " + str(len(producerMsgChecksumUniqList)),  extra=d)
-        logger.info("no. of unique messages on topic [" + topic + "] received by consumer : " + str(len(consumerMsgChecksumUniqList)),  extra=d)
-        validationStatusDict["Unique messages from producer on [" + topic + "]"] = str(len(list(producerMsgChecksumSet)))
-        validationStatusDict["Unique messages from consumer on [" + topic + "]"] = str(len(list(consumerMsgChecksumSet)))
+        logger.info("no. of messages on topic [" + topic + "] sent from producer          : " + str(producerMsgCount), extra=d)
+        logger.info("no. of messages on topic [" + topic + "] received by consumer        : " + str(consumerMsgCount), extra=d)
+        logger.info("no. of unique messages on topic [" + topic + "] sent from producer   : " + str(producerUniqMsgCount),  extra=d)
+        logger.info("no. of unique messages on topic [" + topic + "] received by consumer : " + str(consumerUniqMsgCount),  extra=d)
+        validationStatusDict["Unique messages from producer on [" + topic + "]"] = str(producerUniqMsgCount)
+        validationStatusDict["Unique messages from consumer on [" + topic + "]"] = str(consumerUniqMsgCount)
 
-        if ( len(producerMsgChecksumList) > 0 and len(list(producerMsgChecksumSet)) == len(list(consumerMsgChecksumSet))):
+        if ( producerMsgCount > 0 and producerUniqMsgCount == consumerUniqMsgCount ):
             validationStatusDict["Validate for data matched on topic [" + topic + "]"] = "PASSED"
         else:
             validationStatusDict["Validate for data matched on topic [" + topic + "]"] = "FAILED"
@@ -1470,6 +1852,7 @@ def validate_broker_log_segment_checksum(systemTestEnv, testcaseEnv, clusterName
     anonLogger.info("================================================")
 
     brokerLogCksumDict   = {}
+    missingLogDirCount   = 0
     testCaseBaseDir      = testcaseEnv.testCaseBaseDir
     tcConfigsList        = testcaseEnv.testcaseConfigsList
     validationStatusDict = testcaseEnv.validationStatusDict
@@ -1488,6 +1871,21 @@ def validate_broker_log_segment_checksum(systemTestEnv, testcaseEnv, clusterName
         logPathName              = get_testcase_config_log_dir_pathname(testcaseEnv, "broker", brokerEntityId, "default")
         localLogSegmentPath      = logPathName + "/" + remoteLogSegmentDir
 
+        # use the checksums computed on the remote host if they are available
+        logSegmentChecksumsPathName = logPathName + "/" + LOG_SEGMENT_CHECKSUMS_FILENAME
+        if os.path.isfile(logSegmentChecksumsPathName) and os.path.getsize(logSegmentChecksumsPathName) > 0:
+            for line in open(logSegmentChecksumsPathName, "r").readlines():
+                tokens = line.split()
+                if len(tokens) == 2:
+                    # logSegmentKey is like this : kafka_server_9_logs:test_1-0 (delimited by ':')
+                    brokerLogCksumDict[remoteLogSegmentDir + ":" + tokens[0]] = tokens[1]
+            continue
+
+        if not os.path.isdir(localLogSegmentPath):
+            missingLogDirCount += 1
+            logger.error("log segment dir " + localLogSegmentPath + " not found", extra=d)
+            continue
+
         # localLogSegmentPath :
         # .../system_test/mirror_maker_testsuite/testcase_5002/logs/broker-4/kafka_server_4_logs
         #   |- test_1-0
@@ -1569,7 +1967,7 @@ def validate_broker_log_segment_checksum(systemTestEnv, testcaseEnv, clusterName
             checksumDict[topicPartition] = []
             checksumDict[topicPartition].append(md5Checksum)
 
-    failureCount = 0
+    failureCount = missingLogDirCount
 
     # loop through checksumDict: the checksums should be the same inside each
     # topic-partition's list. Otherwise, checksum mismatched is detected
@@ -1646,7 +2044,7 @@ def start_simple_consumer(systemTestEnv, testcaseEnv, minStartingOffsetDict=None
 
                 outputFilePathName = consumerLogPath + "/simple_consumer_" + topic + "-" + str(partitionId) + "_r" + str(replicaIndex) + ".log"
                 brokerPortLabel = brokerPort.replace(":", "_")
-                cmdList = ["ssh " + host,
+                cmdList = [system_test_utils.SSH_CMD + " " + host,
                            "'JAVA_HOME=" + javaHome,
                            kafkaRunClassBin + " kafka.tools.SimpleConsumerShell",
                            "--broker-list " + brokerListStr,
@@ -1760,7 +2158,7 @@ def get_controller_attributes(systemTestEnv, testcaseEnv):
     javaHome           = system_test_utils.get_data_by_lookup_keyval(clusterConfigsList, "entity_id", zkEntityId, "java_home")
     kafkaRunClassBin   = kafkaHome + "/bin/kafka-run-class.sh"
 
-    cmdStrList = ["ssh " + hostname,
+    cmdStrList = [system_test_utils.SSH_CMD + " " + hostname,
                   "\"JAVA_HOME=" + javaHome,
                   kafkaRunClassBin + " org.apache.zookeeper.ZooKeeperMain",
                   "-server " + testcaseEnv.userDefinedEnvVarDict["sourceZkConnectStr"],
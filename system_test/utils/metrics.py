@@ -65,9 +65,23 @@ attributeNameToNameInReportedFileMap = {
 def getCSVFileNameFromMetricsMbeanName(mbeanName):
     return mbeanName.replace(":type=", ".").replace(",name=", ".") + ".csv"
 
-def read_metrics_definition(metricsFile):
+# cache of metrics file pathname => (mtime, parsed json data) such that the
+# metrics file is parsed again only when it has been modified
+_METRICS_CACHE = {}
+
+def read_metrics_json_data(metricsFile):
+    mtime = os.stat(metricsFile).st_mtime
+    cachedMtimeJsonData = _METRICS_CACHE.get(metricsFile)
+    if cachedMtimeJsonData is not None and cachedMtimeJsonData[0] == mtime:
+        return cachedMtimeJsonData[1]
+
     metricsFileData = open(metricsFile, "r").read()
     metricsJsonData = json.loads(metricsFileData)
+    _METRICS_CACHE[metricsFile] = (mtime, metricsJsonData)
+    return metricsJsonData
+
+def read_metrics_definition(metricsFile):
+    metricsJsonData = read_metrics_json_data(metricsFile)
     allDashboards = metricsJsonData['dashboards']
     allGraphs = []
     for dashboard in allDashboards:
@@ -81,8 +95,7 @@ def read_metrics_definition(metricsFile):
     return allGraphs
             
 def get_dashboard_definition(metricsFile, role):
-    metricsFileData = open(metricsFile, "r").read()
-    metricsJsonData = json.loads(metricsFileData)
+    metricsJsonData = read_metrics_json_data(metricsFile)
     allDashboards = metricsJsonData['dashboards']
     dashboardsForRole = []
     for dashboard in allDashboards:
@@ -252,7 +265,7 @@ def start_metrics_collection(jmxHost, jmxPort, role, entityId, systemTestEnv, te
     
     for mbean in mbeansForRole:
         outputCsvFile = entityMetricsDir + "/" + mbean + ".csv"
-        startMetricsCmdList = ["ssh " + jmxHost,
+        startMetricsCmdList = [system_test_utils.SSH_CMD + " " + jmxHost,
                                "'JAVA_HOME=" + javaHome,
                                "JMX_PORT= " + kafkaHome + "/bin/kafka-run-class.sh kafka.tools.JmxTool",
                                "--jmx-url " + jmxUrl,
@@ -265,7 +278,7 @@ def start_metrics_collection(jmxHost, jmxPort, role, entityId, systemTestEnv, te
         system_test_utils.async_sys_call(startMetricsCommand)
         time.sleep(1)
 
-        pidCmdStr = "ssh " + jmxHost + " 'cat " + entityMetricsDir + "/entity_pid' 2> /dev/null"
+        pidCmdStr = system_test_utils.SSH_CMD + " " + jmxHost + " 'cat " + entityMetricsDir + "/entity_pid' 2> /dev/null"
         logger.debug("executing command: [" + pidCmdStr + "]", extra=d)
         subproc = system_test_utils.sys_call_return_subproc(pidCmdStr)
 
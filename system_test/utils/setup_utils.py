@@ -39,9 +39,10 @@ class SetupUtils(object):
         d = {'name_of_class': self.__class__.__name__}
         self.logger.debug("#### constructor inside SetupUtils", extra=self.d)
 
-    def log_message(self, message):
+    def log_message(self, message, *args):
+        # args are merged into message lazily, %-style, by the logger
         print
         self.anonLogger.info("======================================================")
-        self.anonLogger.info(message)
+        self.anonLogger.info(message, *args)
         self.anonLogger.info("======================================================")
 
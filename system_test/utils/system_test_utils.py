@@ -21,6 +21,8 @@
 # ===================================
 
 import copy
+import fcntl
+import hashlib
 import inspect
 import json
 import logging
@@ -30,6 +32,7 @@ import signal
 import socket
 import subprocess
 import sys
+import threading
 import time
 
 logger  = logging.getLogger("namedLogger")
@@ -37,6 +40,34 @@ aLogger = logging.getLogger("anonymousLogger")
 thisClassName = '(system_test_utils)'
 d = {'name_of_class': thisClassName}
 
+# the ssh / scp / rsync calls to a remote host share a single connection
+# (ssh ControlMaster) which stays open for 10 min after the last call. sshd
+# allows 10 sessions per connection by default (MaxSessions) => each shard
+# gets its own connection (see use_ssh_control_path_suffix)
+def get_ssh_opts(controlPathSuffix=""):
+    return "-o ControlMaster=auto -o ControlPath=/tmp/kafka_system_test_ssh_" + controlPathSuffix + \
+           "%r@%h:%p -o ControlPersist=10m"
+
+SSH_OPTS = get_ssh_opts()
+SSH_CMD  = "ssh " + SSH_OPTS
+SCP_CMD  = "scp " + SSH_OPTS
+RSYNC_SSH_OPT = "-e '" + SSH_CMD + "'"
+
+
+# max. no. of concurrent calls in run_in_parallel, leaving room below
+# MaxSessions for the long running sessions (eg. producers)
+MAX_PARALLEL_CALLS = 6
+
+
+def use_ssh_control_path_suffix(controlPathSuffix):
+    # the ssh / scp / rsync calls made from this process onwards go through
+    # the connections identified by controlPathSuffix
+    global SSH_OPTS, SSH_CMD, SCP_CMD, RSYNC_SSH_OPT
+    SSH_OPTS = get_ssh_opts(controlPathSuffix)
+    SSH_CMD  = "ssh " + SSH_OPTS
+    SCP_CMD  = "scp " + SSH_OPTS
+    RSYNC_SSH_OPT = "-e '" + SSH_CMD + "'"
+
 
 def get_current_unix_timestamp():
     ts = time.time()
@@ -57,22 +88,87 @@ def sys_call(cmdStr):
 
 
 def remote_async_sys_call(host, cmd):
-    cmdStr = "ssh " + host + " \"" + cmd + "\""
+    cmdStr = SSH_CMD + " " + host + " \"" + cmd + "\""
     logger.info("executing command [" + cmdStr + "]", extra=d)
     async_sys_call(cmdStr)
 
 
 def remote_sys_call(host, cmd):
-    cmdStr = "ssh " + host + " \"" + cmd + "\""
+    cmdStr = SSH_CMD + " " + host + " \"" + cmd + "\""
     logger.info("executing command [" + cmdStr + "]", extra=d)
     sys_call(cmdStr)
 
 
+class BackgroundCall(threading.Thread):
+    # calls func(*args) in a separate thread. join() waits for the call to
+    # complete and re-raises the exception (if any) raised by the call
+
+    def __init__(self, func, args):
+        threading.Thread.__init__(self)
+        self.func    = func
+        self.args    = args
+        self.excInfo = None
+
+    def run(self):
+        try:
+            self.func(*self.args)
+        except BaseException:
+            # including SystemExit such as sys.exit() when aborting a test
+            self.excInfo = sys.exc_info()
+
+    def join(self):
+        threading.Thread.join(self)
+        if self.excInfo is not None:
+            raise self.excInfo[0], self.excInfo[1], self.excInfo[2]
+
+
+def run_in_parallel(func, argsList):
+    # call func with each tuple of arguments in argsList concurrently and wait
+    # for all the calls to complete. The first exception raised is re-raised.
+    # At most MAX_PARALLEL_CALLS calls run at a time such that the ssh calls
+    # sharing a connection stay below the max. no. of sessions of sshd
+    semaphore = threading.BoundedSemaphore(MAX_PARALLEL_CALLS)
+    def call_func(*args):
+        semaphore.acquire()
+        try:
+            func(*args)
+        finally:
+            semaphore.release()
+
+    callList = []
+    for args in argsList:
+        call = BackgroundCall(call_func, args)
+        call.start()
+        callList.append(call)
+
+    join_background_calls(callList)
+
+
+def join_background_calls(callList, excInfo=None):
+    # wait for all the BackgroundCall in callList to complete. excInfo is the
+    # sys.exc_info() of an exception raised by the caller in the meantime : it
+    # is re-raised in preference to the first exception raised by the calls
+    for call in callList:
+        try:
+            call.join()
+        except BaseException:
+            if excInfo is None:
+                excInfo = sys.exc_info()
+
+    if excInfo is not None:
+        raise excInfo[0], excInfo[1], excInfo[2]
+
+
 def get_dir_paths_with_prefix(fullPath, dirNamePrefix):
+    # returns the sorted list of dir pathnames. Only the names matching
+    # the prefix are stat'ed
     dirsList = []
     for dirName in os.listdir(fullPath):
-        if not os.path.isfile(dirName) and dirName.startswith(dirNamePrefix):
-            dirsList.append(os.path.abspath(fullPath + "/" + dirName))
+        if dirName.startswith(dirNamePrefix):
+            dirPathName = os.path.abspath(os.path.join(fullPath, dirName))
+            if os.path.isdir(dirPathName):
+                dirsList.append(dirPathName)
+    dirsList.sort()
     return dirsList
 
 
@@ -80,6 +176,76 @@ def get_testcase_prop_json_pathname(testcasePathName):
     testcaseDirName = os.path.basename(testcasePathName)
     return testcasePathName + "/" + testcaseDirName + "_properties.json"
 
+def print_testcase_description(testcaseDirName, testcaseNonEntityDataDict):
+    testcaseDescription = ""
+    for k,v in testcaseNonEntityDataDict.items():
+        if ( k == "description" ):
+            testcaseDescription = v
+
+    print "\n"
+    print "======================================================================================="
+    print "Test Case Name :", testcaseDirName
+    print "======================================================================================="
+    print "Description    :"
+    for step in sorted(testcaseDescription.iterkeys()):
+        print "   ", step, ":", testcaseDescription[step]
+    print "======================================================================================="
+    print "Test Case Args :"
+    for k,v in testcaseNonEntityDataDict["testcase_args"].items():
+        print "   ", k, " : ", v
+    print "======================================================================================="
+
+def get_testcase_config_hash(testcaseConfigsList, testcaseArgumentsDict):
+    # hash of the testcase entity configs and arguments as found in
+    # testcase_<n>_properties.json
+    return hashlib.sha1(json.dumps([testcaseConfigsList, testcaseArgumentsDict], sort_keys=True)).hexdigest()
+
+def get_git_sha(pathName):
+    # sha of HEAD, suffixed with the hash of the uncommitted changes (if any)
+    # such that an edited tree never matches the sha of its clean HEAD
+    gitSha = sys_call("cd " + pathName + " && git rev-parse HEAD 2> /dev/null").strip()
+    if len(gitSha) == 0:
+        return ""
+
+    gitDiff = sys_call("cd " + pathName + " && git diff HEAD 2> /dev/null")
+    if len(gitDiff) > 0:
+        gitSha += "-dirty-" + hashlib.sha1(gitDiff).hexdigest()
+    return gitSha
+
+def load_results_manifest(manifestPathName):
+    # results manifest in the form of:
+    # { testcase_<n> : { "status" : "PASSED", "git_sha" : "...", "config_hash" : "..." }, ... }
+    try:
+        return json.loads(open(manifestPathName, "r").read())
+    except:
+        return {}
+
+def update_results_manifest(manifestPathName, testcaseDirName, testcaseResultDict):
+    # the testcases of a suite may run in concurrent processes => serialize
+    # the updates by locking the manifest dir (no lock file is left behind)
+    # and replace the manifest atomically
+    manifestDir = os.path.dirname(manifestPathName)
+    try:
+        os.makedirs(manifestDir)
+    except OSError:
+        if not os.path.isdir(manifestDir):
+            raise
+
+    lockFd = os.open(manifestDir, os.O_RDONLY)
+    fcntl.flock(lockFd, fcntl.LOCK_EX)
+    try:
+        manifestDict = load_results_manifest(manifestPathName)
+        manifestDict[testcaseDirName] = testcaseResultDict
+
+        tmpManifestPathName = manifestPathName + "." + str(os.getpid()) + ".tmp"
+        outfile = open(tmpManifestPathName, "w")
+        outfile.write(json.dumps(manifestDict, indent=4, sort_keys=True))
+        outfile.close()
+        os.rename(tmpManifestPathName, manifestPathName)
+    finally:
+        fcntl.flock(lockFd, fcntl.LOCK_UN)
+        os.close(lockFd)
+
 def get_json_list_data(infile):
     json_file_str = open(infile, "r").read()
     json_data     = json.loads(json_file_str)
@@ -179,7 +345,7 @@ def get_json_dict_data(infile):
 def get_remote_child_processes(hostname, pid):
     pidStack = []
 
-    cmdList = ['''ssh ''' + hostname,
+    cmdList = [SSH_CMD + " " + hostname,
               ''''pid=''' + pid + '''; prev_pid=""; echo $pid;''',
               '''while [[ "x$pid" != "x" ]];''',
               '''do prev_pid=$pid;''',
@@ -221,29 +387,39 @@ def get_child_processes(pid):
 
 def sigterm_remote_process(hostname, pidStack):
 
+    if ( len(pidStack) == 0 ):
+        return
+
+    # signal all the pids with a single ssh call, children first
+    pidList = []
     while ( len(pidStack) > 0 ):
-        pid = pidStack.pop()
-        cmdStr = "ssh " + hostname + " 'kill -15 " + pid + "'"
+        pidList.append(pidStack.pop())
+    cmdStr = SSH_CMD + " " + hostname + " 'kill -15 " + " ".join(pidList) + "'"
 
-        try:
-            logger.debug("executing command [" + cmdStr + "]", extra=d)
-            sys_call_return_subproc(cmdStr)
-        except:
-            print "WARN - pid:",pid,"not found"
-            raise
+    try:
+        logger.debug("executing command [" + cmdStr + "]", extra=d)
+        sys_call_return_subproc(cmdStr)
+    except:
+        print "WARN - pids:",pidList,"not found"
+        raise
 
 def sigkill_remote_process(hostname, pidStack):
 
+    if ( len(pidStack) == 0 ):
+        return
+
+    # signal all the pids with a single ssh call, children first
+    pidList = []
     while ( len(pidStack) > 0 ):
-        pid = pidStack.pop()
-        cmdStr = "ssh " + hostname + " 'kill -9 " + pid + "'"
+        pidList.append(pidStack.pop())
+    cmdStr = SSH_CMD + " " + hostname + " 'kill -9 " + " ".join(pidList) + "'"
 
-        try:
-            logger.debug("executing command [" + cmdStr + "]", extra=d)
-            sys_call_return_subproc(cmdStr)
-        except:
-            print "WARN - pid:",pid,"not found"
-            raise
+    try:
+        logger.debug("executing command [" + cmdStr + "]", extra=d)
+        sys_call_return_subproc(cmdStr)
+    except:
+        print "WARN - pids:",pidList,"not found"
+        raise
 
 def simulate_garbage_collection_pause_in_remote_process(hostname, pidStack, pauseTimeInSeconds):
     pausedPidStack = []
@@ -252,7 +428,7 @@ def simulate_garbage_collection_pause_in_remote_process(hostname, pidStack, paus
     while len(pidStack) > 0:
         pid = pidStack.pop()
         pausedPidStack.append(pid)
-        cmdStr = "ssh " + hostname + " 'kill -SIGSTOP " + pid + "'"
+        cmdStr = SSH_CMD + " " + hostname + " 'kill -SIGSTOP " + pid + "'"
 
         try:
             logger.debug("executing command [" + cmdStr + "]", extra=d)
@@ -266,7 +442,7 @@ def simulate_garbage_collection_pause_in_remote_process(hostname, pidStack, paus
     # resume execution of the processes
     while len(pausedPidStack) > 0:
         pid = pausedPidStack.pop()
-        cmdStr = "ssh " + hostname + " 'kill -SIGCONT " + pid + "'"
+        cmdStr = SSH_CMD + " " + hostname + " 'kill -SIGCONT " + pid + "'"
 
         try:
             logger.debug("executing command [" + cmdStr + "]", extra=d)
@@ -311,7 +487,7 @@ def sys_call_return_subproc(cmd_str):
 
 
 def remote_host_file_exists(hostname, pathname):
-    cmdStr = "ssh " + hostname + " 'ls " + pathname + "'"
+    cmdStr = SSH_CMD + " " + hostname + " 'ls " + pathname + "'"
     logger.debug("executing command: [" + cmdStr + "]", extra=d)
     subproc = sys_call_return_subproc(cmdStr)
 
@@ -322,7 +498,7 @@ def remote_host_file_exists(hostname, pathname):
 
 
 def remote_host_directory_exists(hostname, path):
-    cmdStr = "ssh " + hostname + " 'ls -d " + path + "'"
+    cmdStr = SSH_CMD + " " + hostname + " 'ls -d " + path + "'"
     logger.debug("executing command: [" + cmdStr + "]", extra=d)
     subproc = sys_call_return_subproc(cmdStr)
 
@@ -332,8 +508,34 @@ def remote_host_directory_exists(hostname, path):
     return True
 
 
+def remote_process_is_running(hostname, pid):
+    cmdStr = SSH_CMD + " " + hostname + " 'ps -p " + pid + " -o pid=' 2> /dev/null"
+    logger.debug("executing command: [" + cmdStr + "]", extra=d)
+    subproc = sys_call_return_subproc(cmdStr)
+
+    for line in subproc.stdout.readlines():
+        if line.strip() == pid.strip():
+            return True
+    return False
+
+
+def wait_until(conditionFunc, timeoutSec):
+    # poll conditionFunc until it returns True, starting at 100ms between
+    # polls and backing off up to 1s. Returns False if timeoutSec is reached
+    pollIntervalSec = 0.1
+    deadline        = time.time() + timeoutSec
+
+    while not conditionFunc():
+        remainingSec = deadline - time.time()
+        if remainingSec <= 0:
+            return False
+        time.sleep(min(pollIntervalSec, remainingSec))
+        pollIntervalSec = min(pollIntervalSec * 2, 1)
+    return True
+
+
 def remote_host_processes_stopped(hostname):
-    cmdStr = "ssh " + hostname + \
+    cmdStr = SSH_CMD + " " + hostname + \
              " \"ps auxw | grep -v grep | grep -v Bootstrap | grep -i 'java\|run\-\|producer\|consumer\|jmxtool\|kafka' | wc -l\" 2> /dev/null"
 
     logger.info("executing command: [" + cmdStr + "]", extra=d)
@@ -409,9 +611,26 @@ def setup_remote_hosts(systemTestEnv):
 
     return True
 
+def open_ssh_control_masters(clusterEntityConfigDictList):
+    # open the shared ssh connection of every remote host up front
+    argsList = []
+    for hostname in set(get_data_from_list_of_dicts(clusterEntityConfigDictList, None, None, "hostname")):
+        argsList.append((SSH_CMD + " " + hostname + " true",))
+
+    run_in_parallel(sys_call, argsList)
+
+
+def close_ssh_control_masters(clusterEntityConfigDictList):
+    argsList = []
+    for hostname in set(get_data_from_list_of_dicts(clusterEntityConfigDictList, None, None, "hostname")):
+        argsList.append((SSH_CMD + " -O exit " + hostname + " 2> /dev/null",))
+
+    run_in_parallel(sys_call, argsList)
+
+
 def copy_source_to_remote_hosts(hostname, sourceDir, destDir):
 
-    cmdStr = "rsync -avz --delete-before " + sourceDir + "/ " + hostname + ":" + destDir
+    cmdStr = "rsync -avz --delete-before " + RSYNC_SSH_OPT + " " + sourceDir + "/ " + hostname + ":" + destDir
     logger.info("executing command [" + cmdStr + "]", extra=d)
     subproc = sys_call_return_subproc(cmdStr)
 
@@ -422,11 +641,11 @@ def copy_source_to_remote_hosts(hostname, sourceDir, destDir):
 def remove_kafka_home_dir_at_remote_hosts(hostname, kafkaHome):
 
     if remote_host_file_exists(hostname, kafkaHome + "/bin/kafka-run-class.sh"):
-        cmdStr  = "ssh " + hostname + " 'chmod -R 777 " + kafkaHome + "'"
+        cmdStr  = SSH_CMD + " " + hostname + " 'chmod -R 777 " + kafkaHome + "'"
         logger.info("executing command [" + cmdStr + "]", extra=d)
         sys_call(cmdStr)
 
-        cmdStr  = "ssh " + hostname + " 'rm -rf " + kafkaHome + "'"
+        cmdStr  = SSH_CMD + " " + hostname + " 'rm -rf " + kafkaHome + "'"
         logger.info("executing command [" + cmdStr + "]", extra=d)
         #sys_call(cmdStr)
     else:
@@ -24,6 +24,7 @@ import json
 import os
 import sys
 import thread
+import threading
 
 import system_test_utils
 
@@ -127,6 +128,9 @@ class TestcaseEnv():
 
         self.numProducerThreadsRunning = 0
 
+        # set by the last producer thread when all producer threads have stopped
+        self.backgroundProducerStoppedEvent = threading.Event()
+
     def initWithKnownTestCasePathName(self, testCasePathName):
         testcaseDirName = os.path.basename(testCasePathName)
         self.testcaseResultsDict["_test_case_name"] = testcaseDirName
@@ -141,23 +145,8 @@ class TestcaseEnv():
         self.testcaseNonEntityDataDict = system_test_utils.get_json_dict_data(self.testcasePropJsonPathName)
 
     def printTestCaseDescription(self, testcaseDirName):
-        testcaseDescription = ""
-        for k,v in self.testcaseNonEntityDataDict.items():
-            if ( k == "description" ):
-                testcaseDescription = v
-
-        print "\n"
-        print "======================================================================================="
-        print "Test Case Name :", testcaseDirName
-        print "======================================================================================="
-        print "Description    :"
-        for step in sorted(testcaseDescription.iterkeys()):
-            print "   ", step, ":", testcaseDescription[step]
-        print "======================================================================================="
-        print "Test Case Args :"
+        system_test_utils.print_testcase_description(testcaseDirName, self.testcaseNonEntityDataDict)
         for k,v in self.testcaseArgumentsDict.items():
-            print "   ", k, " : ", v
             self.testcaseResultsDict["arg : " + k] = v
-        print "======================================================================================="
 
 